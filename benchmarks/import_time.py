@@ -0,0 +1,82 @@
+# import_time.py
+#
+# Measures the import cost of the charts_helper modules on top of numpy and
+# pandas, each in a fresh interpreter, and fails when a module goes over its
+# budget or drags in one of the heavy plotting/geo dependencies.
+#
+#   python benchmarks/import_time.py [--repeat N]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# milliseconds on top of "import numpy, pandas"
+budgets_ms = {
+    "charts_helper.stats": 50,
+    "charts_helper.helper": 50,
+    "charts_helper.loader": 50,
+}
+
+heavy_modules = [
+    "geopandas",
+    "shapely",
+    "plotly.express",
+    "plotly.graph_objects",
+    "plotly.io",
+]
+
+probe = """
+import json, sys, time
+import numpy, pandas
+start = time.perf_counter()
+import {module}
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({{
+    "ms": elapsed,
+    "heavy": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def measure(module, repeat):
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", probe.format(module=module, heavy=heavy_modules)],
+            cwd=root,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        runs.append(json.loads(out.stdout))
+    return min(r["ms"] for r in runs), runs[0]["heavy"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    failed = False
+    for module, budget in budgets_ms.items():
+        ms, heavy = measure(module, args.repeat)
+        ok = ms <= budget and not heavy
+        failed |= not ok
+        print(
+            "{:<24} {:8.1f} ms (budget {} ms) {}{}".format(
+                module,
+                ms,
+                budget,
+                "ok" if ok else "FAIL",
+                " loads {}".format(", ".join(heavy)) if heavy else "",
+            )
+        )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+# pipeline.py
+#
+# Times the charting helpers on synthetic data shaped like the smartcity-tpn
+# files, at several multiples of their size, and appends the results to a
+# history file (benchmarks/history.jsonl, machine-specific and not tracked) so
+# runs can be compared over time.
+#
+#   python benchmarks/pipeline.py [--scales 1 10 100 1000] [--only NAME ...]
+#
+# Result sets grow by adding runs (seeds) to every (scenario, instance, ev,
+# alg) group of the template file; GPS traces grow by sampling every route
+# more densely. Each benchmark reports the best wall time of --repeat runs
+# and the tracemalloc high-water mark of the first one. Figures are built
+# with show=False and output_dir=None, so nothing is rendered or exported.
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+from charts_helper import deltaq  # noqa: E402
+from charts_helper import helper  # noqa: E402
+
+default_results = os.path.join(root, "smartcity-tpn", "turin-tese3.csv")
+default_gps = os.path.join(root, "smartcity-tpn", "turin-gps.csv")
+default_history = os.path.join(root, "benchmarks", "history.jsonl")
+default_scales = [1, 10, 100, 1000]
+
+result_metrics = ["tl", "rt", "ttt", "eff", "imp", "perc", "preemptime"]
+
+
+def synthetic_results(template, scale, seed=0):
+    # every row becomes `scale` runs whose metrics are jittered around it
+    rng = np.random.default_rng(seed)
+    df = template.loc[template.index.repeat(scale)].reset_index(drop=True)
+    df["seed"] = rng.integers(0, 2**31 - 1, len(df))
+    noise = rng.lognormal(0, 0.1, (len(df), len(result_metrics)))
+    for i, metric in enumerate(result_metrics):
+        if metric in df:
+            df[metric] = df[metric] * noise[:, i]
+    if "tl" in df and "ttt" in df:
+        df["tl-ttt"] = (df["tl"] / df["ttt"]) * 100
+    return df
+
+
+def synthetic_gps(template, scale):
+    # `scale` points per original step, linearly interpolated along each route
+    template = template.sort_values(["scenario", "ev", "step"], kind="mergesort")
+    frames = []
+    for (scenario, ev), route in template.groupby(["scenario", "ev"], sort=False):
+        steps = route["step"].to_numpy(dtype=np.float64)
+        fine = np.linspace(steps[0], steps[-1], (len(route) - 1) * scale + 1)
+        frames.append(
+            pd.DataFrame(
+                {
+                    "scenario": scenario,
+                    "ev": ev,
+                    "step": np.arange(len(fine)) + int(steps[0]) * scale,
+                    "lon": np.interp(fine, steps, route["lon"].to_numpy()),
+                    "lat": np.interp(fine, steps, route["lat"].to_numpy()),
+                }
+            )
+        )
+    return pd.concat(frames, ignore_index=True)
+
+
+def bench_quartiles(data):
+    values = data["results"]["tl"].dropna().tolist()
+    return lambda: helper.get_quartiles_data(values, "all")
+
+
+def bench_boxplot_grouped(data):
+    df = data["results"]
+    df = df[df["alg"] != "no-preemption"]
+    return lambda: helper.make_boxplot_grouped(
+        df, "tl", "bench", "bench", cache=False, show=False, output_dir=None
+    )
+
+
+def bench_boxplot_grouped_precomputed(data):
+    df = data["results"]
+    df = df[df["alg"] != "no-preemption"]
+    return lambda: helper.make_boxplot_grouped(
+        df,
+        "tl",
+        "bench",
+        "bench",
+        cache=False,
+        show=False,
+        output_dir=None,
+        precomputed=True,
+    )
+
+
+def bench_csv_to_geo(data):
+    return lambda: helper.csv_to_geo(data["gps"])
+
+
+def bench_route_traces(data):
+    geo_df = helper.csv_to_geo(data["gps"])
+    return lambda: helper.route_traces(geo_df)
+
+
+def bench_trajectory_route(data):
+    # opening the store and reading one route out of it
+    from charts_helper import trajectories
+
+    path = os.path.join(data["tmp"], "gps-{}.traj".format(data["scale"]))
+    store = trajectories.from_frame(data["gps"])
+    trajectories.write(store, path)
+    scenario, ev = store["index"][0]
+    return lambda: trajectories.to_frame(
+        trajectories.open_store(path), scenario=scenario, ev=ev
+    )
+
+
+def bench_get_values(data):
+    from charts_helper import old_helper
+
+    df = data["results"]
+    df = df[df["alg"] == "no-preemption"]
+    # the template scenario has no vehicle counts, sp's stand in for them
+    return lambda: old_helper.get_values(
+        df, "tl", df["scenario"].iloc[0], counts=old_helper.nvec["sp"]
+    )
+
+
+def bench_deltaq(data):
+    # get_all_dfs at 1x; the model does not read the result files, so larger
+    # scales sweep a Q grid that many times finer against every combination
+    # of its speeds and cycle lengths
+    Q = np.linspace(0, 500, len(deltaq.Q_vector) * data["scale"])
+    speeds = [50, 70, 90, 110]
+    cycles = [15, 30, 45, 60]
+    if data["scale"] == 1:
+        return deltaq.get_all_dfs
+    return lambda: deltaq.sweep(Q=Q, speed=speeds, cycle_length=cycles)
+
+
+benchmarks = {
+    "get_quartiles_data": (bench_quartiles, "results"),
+    "make_boxplot_grouped": (bench_boxplot_grouped, "results"),
+    "make_boxplot_grouped_precomputed": (bench_boxplot_grouped_precomputed, "results"),
+    "csv_to_geo": (bench_csv_to_geo, "gps"),
+    "route_traces": (bench_route_traces, "gps"),
+    "trajectories.route": (bench_trajectory_route, "gps"),
+    "old_helper.get_values": (bench_get_values, "results"),
+    "deltaq": (bench_deltaq, None),
+}
+
+
+def warm_up():
+    # imported up front so the first benchmark does not pay for them
+    import geopandas  # noqa: F401
+    import plotly.graph_objects  # noqa: F401
+    import shapely  # noqa: F401
+
+    from charts_helper import old_helper  # noqa: F401
+
+
+def measure(fn, repeat):
+    # the helpers print their LaTeX rows, which would dominate small runs
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracemalloc.start()
+        start = time.perf_counter()
+        fn()
+        times = [time.perf_counter() - start]
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        for _ in range(repeat - 1):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+    return min(times), peak / 2**20
+
+
+def git_revision():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def read_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def previous_results(history):
+    # latest result of every (benchmark, scale) pair
+    return {(r["benchmark"], r["scale"]): r for r in history}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type=int, nargs="*", default=default_scales)
+    parser.add_argument("--only", nargs="*", choices=sorted(benchmarks))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--results", default=default_results)
+    parser.add_argument("--gps", default=default_gps)
+    parser.add_argument("--history", default=default_history)
+    parser.add_argument("--no-history", action="store_true")
+    args = parser.parse_args()
+
+    templates = {"results": pd.read_csv(args.results), "gps": pd.read_csv(args.gps)}
+    previous = previous_results(read_history(args.history))
+    run = {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+    }
+
+    names = args.only or list(benchmarks)
+    warm_up()
+    records = []
+    # scratch space for benchmarks that need files, removed at the end
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            data = {
+                "scale": scale,
+                "tmp": tmp,
+                "results": synthetic_results(templates["results"], scale),
+                "gps": synthetic_gps(templates["gps"], scale),
+            }
+            for name in names:
+                setup, dataset = benchmarks[name]
+                rows = len(data[dataset]) if dataset else None
+                seconds, peak_mb = measure(setup(data), args.repeat)
+
+                record = dict(
+                    run,
+                    benchmark=name,
+                    scale=scale,
+                    rows=rows,
+                    seconds=seconds,
+                    peak_mb=peak_mb,
+                )
+                records.append(record)
+
+                before = previous.get((name, scale))
+                change = (
+                    " ({:+.0%})".format(seconds / before["seconds"] - 1)
+                    if before
+                    else ""
+                )
+                print(
+                    "{:<34} {:>6}x {:>10} rows {:10.4f} s{:<9} {:9.1f} MB".format(
+                        name,
+                        scale,
+                        rows if rows is not None else "-",
+                        seconds,
+                        change,
+                        peak_mb,
+                    ),
+                    flush=True,
+                )
+
+    if not args.no_history:
+        with open(args.history, "a") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+# build_figures.py
+#
+# Builds a whole figure set from a JSON spec, headless:
+#
+#   python -m charts_helper.build_figures spec.json [--workers N] [--only NAME]
+#
+# {
+#   "width": 800, "height": 480,
+#   "languages": {"br": "figs-tese/segundoexperimento", "en": "figs-journal"},
+#   "datasets": {
+#     "turinkap": {"path": "smartcity-tpn/turinkap.csv"},
+#     "turin-gps": {"path": "smartcity-tpn/turin-gps.csv", "kind": "gps"}
+#   },
+#   "figures": [
+#     {"name": "turinkap-times", "kind": "boxplot_grouped", "dataset": "turinkap",
+#      "metric": "imp", "title": "tl-imp", "scenario": "turinkap"},
+#     {"name": "turinkap-timeloss-nopreempt", "kind": "boxplot",
+#      "dataset": "turinkap", "metric": "tl", "title": "tl-no-preemption",
+#      "scenario": "turinkap"},
+#     {"name": "turinkap-area", "kind": "map", "dataset": "turin-gps",
+#      "zoom": 9.85, "title": "route", "scenario": "turinkap"}
+#   ]
+# }
+#
+# "title" is a key of helper.title_label and "scenario" a key of
+# helper.scenarios. Every figure is computed once and rendered per language
+# into that language's directory; a figure may override "languages", "width"
+# and "height". "precomputed": true draws the boxplots from their quartiles
+# instead of the raw samples and "offline": true draws the maps without tiles
+# (helper.offline_map_figure); both apply to the whole spec or one figure.
+# Relative paths are resolved against the spec's directory. Each dataset is
+# loaded once, GPS ones through the trajectories store, and all exports go
+# through a single export.batch. With --profile PATH the stage timings are
+# appended to PATH and summarized per figure kind at the end.
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+
+from charts_helper import export
+from charts_helper import helper
+from charts_helper import loader
+from charts_helper import profiling
+from charts_helper import trajectories
+
+figure_kinds = ["boxplot_grouped", "boxplot", "map"]
+
+
+def read_spec(path):
+    with open(path) as f:
+        spec = json.load(f)
+
+    base = os.path.dirname(os.path.abspath(path))
+    for dataset in spec["datasets"].values():
+        dataset["path"] = os.path.join(base, os.path.expanduser(dataset["path"]))
+    spec["languages"] = {
+        lang: os.path.join(base, output_dir)
+        for lang, output_dir in spec.get("languages", {"en": "figs"}).items()
+    }
+    for figure in spec["figures"]:
+        if "languages" in figure:
+            figure["languages"] = {
+                lang: os.path.join(base, output_dir)
+                for lang, output_dir in figure["languages"].items()
+            }
+    return spec
+
+
+def plan(spec, only=None):
+    # dataset -> figures drawn from it, in the order the datasets are first used
+    graph = {}
+    for figure in spec["figures"]:
+        if only and figure["name"] not in only:
+            continue
+        if figure["kind"] not in figure_kinds:
+            raise ValueError(
+                "{}: unknown figure kind {!r}".format(figure["name"], figure["kind"])
+            )
+        if figure["dataset"] not in spec["datasets"]:
+            raise ValueError(
+                "{}: unknown dataset {!r}".format(figure["name"], figure["dataset"])
+            )
+        graph.setdefault(figure["dataset"], []).append(figure)
+    return graph
+
+
+def load_dataset(dataset, cache=True):
+    if dataset.get("kind", "results") == "gps":
+        return {"all": trajectories.to_frame(trajectories.load(dataset["path"], cache))}
+
+    df = loader.load_results(dataset["path"], cache=cache)
+    df_algs, _ = loader.split_results(df)
+    return {"all": df, "algs": df_algs}
+
+
+def build_figure(spec, figure, data, cache=True, output_dirs=None):
+    # the statistics of a figure are computed once for all of its languages;
+    # returns its figures by language. output_dirs overrides the spec's, and a
+    # None directory builds that language without exporting it (see report)
+    if output_dirs is None:
+        output_dirs = figure.get("languages", spec["languages"])
+    for output_dir in output_dirs.values():
+        if output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+    titles = {
+        lang: helper.make_title(figure["title"], figure["scenario"], lang)
+        for lang in output_dirs
+    }
+    options = dict(
+        width=figure.get("width", spec.get("width", 600)),
+        height=figure.get("height", spec.get("height", 480)),
+        cache=cache,
+        show=False,
+    )
+
+    precomputed = figure.get("precomputed", spec.get("precomputed", False))
+    if figure["kind"] == "boxplot_grouped":
+        return helper.make_boxplot_grouped_langs(
+            data["algs"],
+            figure["metric"],
+            titles,
+            figure["name"],
+            output_dirs,
+            precomputed=precomputed,
+            **options,
+        )
+    elif figure["kind"] == "boxplot":
+        return helper.make_boxplot_langs(
+            data["all"],
+            figure["metric"],
+            titles,
+            figure["name"],
+            output_dirs,
+            precomputed=precomputed,
+            **options,
+        )
+    elif figure["kind"] == "map":
+        return helper.make_map_langs(
+            data["all"],
+            figure["zoom"],
+            titles,
+            figure["name"],
+            output_dirs,
+            tolerance=figure.get("tolerance"),
+            stride=figure.get("stride"),
+            offline=figure.get("offline", spec.get("offline", False)),
+            **options,
+        )
+
+
+def build(spec, workers=None, only=None, cache=True, verbose=False):
+    graph = plan(spec, only)
+
+    with export.batch(workers):
+        for name, figures in graph.items():
+            data = load_dataset(spec["datasets"][name], cache)
+            for figure in figures:
+                print("{} <- {}".format(figure["name"], name), file=sys.stderr)
+                # the quartile rows the helpers print are only shown on request
+                if verbose:
+                    build_figure(spec, figure, data, cache)
+                else:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        build_figure(spec, figure, data, cache)
+
+    return graph
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m charts_helper.build_figures")
+    parser.add_argument("spec")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--only", nargs="*", help="figure names to build")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--list", action="store_true", help="print the plan and exit")
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument(
+        "--profile", metavar="PATH", help="append stage timings to a JSON lines file"
+    )
+    args = parser.parse_args(argv)
+
+    spec = read_spec(args.spec)
+    if args.list:
+        for name, figures in plan(spec, args.only).items():
+            print(name)
+            for figure in figures:
+                print("    {} ({})".format(figure["name"], figure["kind"]))
+        return
+
+    with contextlib.ExitStack() as stack:
+        if args.profile:
+            stack.enter_context(profiling.session(args.profile, by=("kind", "stage")))
+        build(
+            spec,
+            workers=args.workers,
+            only=args.only,
+            cache=not args.no_cache,
+            verbose=args.verbose,
+        )
+
+
+if __name__ == "__main__":
+    main()
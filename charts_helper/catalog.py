@@ -0,0 +1,205 @@
+# catalog.py
+#
+# One logical dataset over all the result CSVs, stored as hive-partitioned
+# Parquet (scenario=.../campaign=.../part-<file>.parquet) under a catalog
+# directory:
+#
+#   catalog.build("smartcity-tpn/*.csv", "catalog")
+#   catalog.query("catalog", scenario="turin", campaign="tese3",
+#                 alg=["tpnx", "kapustaimp"], metric="tl")
+#
+# The campaign comes from the file name: the -tese/-tese2/-tese3/-2-journal/
+# -2-new style suffix, or the whole name for files without one. Files that
+# lack some columns (e.g. the avg_trip_* ones) read them as nulls. Queries
+# push the partition, alg/ev and column selections down to the Parquet
+# reader, so only the matching files and columns are read. build only
+# converts the CSVs that changed since the last build.
+
+import glob
+import json
+import os
+import re
+
+import pandas as pd
+
+from charts_helper import loader
+
+manifest_name = "_catalog.json"
+
+campaign_pattern = re.compile(r"-(tese\d*|\d*-?journal|\d*-?new)$")
+
+key_columns = ["scenario", "campaign", "instance", "ev", "alg", "seed"]
+
+
+def campaign_of(path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    match = campaign_pattern.search(stem)
+    return match.group(1) if match else stem
+
+
+def _is_results(path):
+    return "alg" in pd.read_csv(path, nrows=0).columns
+
+
+def _read_manifest(root):
+    try:
+        with open(os.path.join(root, manifest_name)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"sources": {}}
+
+
+def _write_manifest(root, manifest):
+    path = os.path.join(root, manifest_name)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def _convert(path, root, campaign):
+    # one part per (file, scenario); categories become plain strings so parts
+    # written from different files share one schema
+    df = loader.parse_results(path)
+    for column in loader.categorical_columns:
+        if column in df:
+            df[column] = df[column].astype(str)
+    df["source"] = os.path.splitext(os.path.basename(path))[0]
+
+    parts = []
+    for scenario, group in df.groupby("scenario", sort=True):
+        directory = os.path.join(
+            root, "scenario={}".format(scenario), "campaign={}".format(campaign)
+        )
+        os.makedirs(directory, exist_ok=True)
+        part = os.path.join(directory, "part-{}.parquet".format(df["source"].iloc[0]))
+        group.drop(columns="scenario").to_parquet(part + ".tmp", index=False)
+        os.replace(part + ".tmp", part)
+        parts.append(os.path.relpath(part, root))
+    return parts, list(df.columns), len(df)
+
+
+def build(sources, root="catalog", campaigns=None):
+    # sources: a glob pattern or a list of CSVs; GPS files are skipped.
+    # campaigns overrides campaign_of for some file names
+    paths = sorted(glob.glob(sources)) if isinstance(sources, str) else list(sources)
+    os.makedirs(root, exist_ok=True)
+    manifest = _read_manifest(root)
+    known = manifest["sources"]
+
+    for path in paths:
+        name = os.path.basename(path)
+        stat = os.stat(path)
+        state = [stat.st_size, stat.st_mtime_ns, loader.cache_version]
+        if name in known and known[name]["state"] == state:
+            continue
+        if not _is_results(path):
+            continue
+
+        for part in known.get(name, {}).get("parts", []):
+            if os.path.exists(os.path.join(root, part)):
+                os.remove(os.path.join(root, part))
+        campaign = (campaigns or {}).get(name, campaign_of(path))
+        parts, columns, rows = _convert(path, root, campaign)
+        known[name] = {
+            "state": state,
+            "campaign": campaign,
+            "parts": parts,
+            "columns": columns,
+            "rows": rows,
+        }
+
+    _write_manifest(root, manifest)
+    return manifest
+
+
+def partitions(root="catalog"):
+    rows = []
+    for name, source in _read_manifest(root)["sources"].items():
+        for part in source["parts"]:
+            scenario = part.split(os.sep)[0].split("=", 1)[1]
+            rows.append(
+                {"scenario": scenario, "campaign": source["campaign"], "source": name}
+            )
+    return pd.DataFrame(rows, columns=["scenario", "campaign", "source"])
+
+
+def _schema(root):
+    # union of the columns of every part, in the order they were first seen
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    manifest = _read_manifest(root)
+    schemas = [
+        pq.read_schema(os.path.join(root, part))
+        for source in manifest["sources"].values()
+        for part in source["parts"][:1]
+    ]
+    schema = pa.unify_schemas(schemas, promote_options="permissive")
+    return schema.append(pa.field("scenario", pa.string())).append(
+        pa.field("campaign", pa.string())
+    )
+
+
+def _isin(field, values):
+    import pyarrow.compute as pc
+
+    if isinstance(values, str):
+        return pc.field(field) == values
+    return pc.field(field).isin(list(values))
+
+
+def query(
+    root="catalog",
+    scenario=None,
+    campaign=None,
+    alg=None,
+    ev=None,
+    metric=None,
+    columns=None,
+    preemption=None,
+    where=None,
+):
+    # scenario, campaign, alg and ev take one value or a list; metric (one or
+    # a list) keeps only those value columns next to the key columns;
+    # preemption=True drops the no-preemption runs and False keeps only them;
+    # where is an extra pyarrow.compute expression
+    import pyarrow.dataset as ds
+
+    conditions = [
+        _isin(name, values)
+        for name, values in [
+            ("scenario", scenario),
+            ("campaign", campaign),
+            ("alg", alg),
+            ("ev", ev),
+        ]
+        if values is not None
+    ]
+    if preemption is not None:
+        no_preemption = ds.field("alg") == "no-preemption"
+        conditions.append(~no_preemption if preemption else no_preemption)
+    if where is not None:
+        conditions.append(where)
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+
+    schema = _schema(root)
+    if metric is not None:
+        metrics = [metric] if isinstance(metric, str) else list(metric)
+        columns = [c for c in key_columns if c in schema.names] + metrics
+    dataset = ds.dataset(
+        root,
+        format="parquet",
+        partitioning="hive",
+        schema=schema,
+        exclude_invalid_files=False,
+        ignore_prefixes=["_", "."],
+    )
+    df = dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+    for column in loader.categorical_columns + ["campaign"]:
+        if column in df:
+            df[column] = df[column].astype("category")
+    return df
@@ -1,9 +1,9 @@
 # deltaq.py
 
-import math
+import numpy as np
 import pandas as pd
 
-import plotly.express as px
+from charts_helper import profiling
 
 a = 2.6
 k = 0.149129457  # in veh/m = 240 vehicles per mile
@@ -16,48 +16,110 @@ t_alpha = 3
 algs = ['tpn', 'queue']
 
 
+def evaluate(Q, speed, cycle_length, t_alpha=t_alpha, a=a, k=k, s=s, t_flush=t_flush):
+    # every argument may be an array, results follow numpy broadcasting
+    Q = np.asarray(Q, dtype=np.float64)
+    v = np.asarray(speed, dtype=np.float64)/3.6
+    t_ev = t_alpha*np.asarray(cycle_length, dtype=np.float64)
+    d = t_ev*v
+
+    t_last = (Q*k)/s
+    Q_a = (v**2)/(2*a)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_queue = t_last + np.where(Q <= Q_a, np.sqrt((2*Q)/a), v/a + (Q - Q_a)/v)
+    feasible = t_ev - t_queue >= 0
+
+    results = {'D': d, 't_ev': t_ev, 't_queue': t_queue, 'feasible': feasible}
+    for alg in algs:
+        if alg == 'tpn':
+            t_offset = np.maximum(0.5*(t_ev - t_queue - t_flush), 0)
+        elif alg == 'queue':
+            t_offset = np.maximum(t_ev - t_queue, 0)
+
+        t_total = t_queue + t_offset
+        with np.errstate(invalid='ignore'):
+            sq_part = np.sqrt(2*a*k*s**3*t_total + s**4)/a
+        remainder = (s**2)/a + k*s*t_total
+
+        minus_part = (-sq_part + remainder)/(k**2)
+        plus_part = (sq_part + remainder)/(k**2)
+
+        delta_q = -Q + np.maximum(minus_part, plus_part)
+        delta_q = np.where(Q + delta_q > Q_a,
+                           -Q + (s*v*((a**2 - 2)*v + 2*a*t_total))/(2*a*(k*v + s)),
+                           delta_q)
+
+        results[alg] = {
+            'delta_q': delta_q,
+            'activation': t_offset,
+            'valid': feasible & (delta_q >= 0) & (t_offset >= 0),
+        }
+
+    return results
+
+
+def sweep_grid(Q=Q_vector, speed=(50,), cycle_length=(15,), t_alpha=(t_alpha,), a=(a,), k=(k,), s=(s,)):
+    # evaluates the model on the full cartesian grid of the given parameter vectors;
+    # returns the coordinates and one array per output, shaped like the grid
+    coords = {'Q': Q, 'speed': speed, 'cycle_length': cycle_length, 't_alpha': t_alpha, 'a': a, 'k': k, 's': s}
+    coords = {name: np.atleast_1d(np.asarray(values, dtype=np.float64)) for name, values in coords.items()}
+    axes = dict(zip(coords, np.meshgrid(*coords.values(), indexing='ij', sparse=True)))
+
+    shape = tuple(len(values) for values in coords.values())
+    with profiling.stage('deltaq_grid', rows=int(np.prod(shape))):
+        results = evaluate(axes['Q'], axes['speed'], axes['cycle_length'], axes['t_alpha'], axes['a'], axes['k'], axes['s'])
+
+    arrays = {'D': np.broadcast_to(results['D'], shape), 'feasible': np.broadcast_to(results['feasible'], shape)}
+    for alg in algs:
+        for name, values in results[alg].items():
+            arrays['{}_{}'.format(alg, name)] = np.broadcast_to(values, shape)
+    return coords, arrays
+
+
+def sweep(Q=Q_vector, speed=(50,), cycle_length=(15,), t_alpha=(t_alpha,), a=(a,), k=(k,), s=(s,), valid_only=False):
+    # long format: one row per grid point and algorithm
+    coords, arrays = sweep_grid(Q, speed, cycle_length, t_alpha, a, k, s)
+    shape = arrays['D'].shape
+    grid = np.meshgrid(*coords.values(), indexing='ij')
+
+    frames = []
+    for alg in algs:
+        mask = arrays['{}_valid'.format(alg)].ravel() if valid_only else slice(None)
+        data = {'Algorithm': alg}
+        data.update({name: values.ravel()[mask] for name, values in zip(coords, grid)})
+        data['D'] = arrays['D'].ravel()[mask]
+        data['feasible'] = arrays['feasible'].ravel()[mask]
+        for name in ['delta_q', 'activation', 'valid']:
+            data[name] = arrays['{}_{}'.format(alg, name)].ravel()[mask]
+        frames.append(pd.DataFrame(data))
+
+    df = pd.concat(frames, ignore_index=True)
+    df['Algorithm'] = pd.Categorical(df['Algorithm'], categories=algs)
+    return df
+
+
 def get_df(orig_v, cycle_length):
-    data = {'Algorithm': [], 'Queue Length (m)': [], 'Metric' : [], 'Metric Value' : [], 'D': [], 'Instance' : []}
-    v = orig_v/3.6
-    for Q in Q_vector:
-        t_ev = t_alpha*cycle_length
-        d = t_ev*v
-
-        t_last = (Q*k)/s
-        t_queue = t_last
-        Q_a = (v**2)/(2*a)
-
-        t_queue += math.sqrt((2*Q)/a) if Q <= Q_a else v/a + (Q - Q_a)/v
-
-        for alg in algs:
-            if t_ev - t_queue >= 0:
-                if alg == 'tpn':
-                    t_offset = max(0.5*(t_ev - t_queue - t_flush), 0)
-                elif alg == 'queue':
-                    t_offset = max(t_ev - t_queue, 0)
-
-                sq_part = math.sqrt(2*a*k*s**3*(t_queue + t_offset) + s**4)/a
-                remainder = (s**2)/a + k*s*(t_queue + t_offset)
-
-                minus_part = (-sq_part + remainder)/(k**2)
-                plus_part = (sq_part + remainder)/(k**2)
-
-                delta_q = -Q + max(minus_part, plus_part)
-
-                if Q + delta_q > Q_a:
-                    delta_q = -Q + \
-                        (s*v*((a**2 - 2)*v + 2*a*(t_queue + t_offset))) / \
-                        (2*a*(k*v + s))
-
-                if delta_q >= 0 and t_offset >= 0:
-                    for metric in [u'ΔQ (m)', 'Activation (s)']:
-                        data['Algorithm'].append(alg)
-                        data['Queue Length (m)'].append(Q)
-                        data['Metric'].append(metric)
-                        data['Metric Value'].append(delta_q if metric == u'ΔQ (m)' else (0 if alg == 'Queue Based' else t_offset))
-                        data['D'].append(d)
-                        data['Instance'].append('Alg={}-v={}-CL={}'.format(alg,orig_v,cycle_length))
-                    
+    Q = np.asarray(Q_vector, dtype=np.float64)
+    with profiling.stage('deltaq', rows=len(Q), speed=orig_v, cycle_length=cycle_length):
+        results = evaluate(Q, orig_v, cycle_length)
+
+    # rows ordered by queue length, then algorithm, then metric
+    valid = np.stack([results[alg]['valid'] for alg in algs], axis=1).ravel()
+    delta_q = np.stack([results[alg]['delta_q'] for alg in algs], axis=1).ravel()[valid]
+    activation = np.stack([results[alg]['activation'] for alg in algs], axis=1).ravel()[valid]
+    alg_column = np.tile(algs, len(Q))[valid]
+    Q_column = np.repeat(Q_vector, len(algs))[valid]
+
+    metrics = [u'ΔQ (m)', 'Activation (s)']
+    data = {
+        'Algorithm': np.repeat(alg_column, len(metrics)),
+        'Queue Length (m)': np.repeat(Q_column, len(metrics)),
+        'Metric': np.tile(metrics, len(alg_column)),
+        'Metric Value': np.column_stack([delta_q, activation]).ravel(),
+        'D': np.full(len(alg_column)*len(metrics), results['D']),
+        'Instance': np.repeat(['Alg={}-v={}-CL={}'.format(alg, orig_v, cycle_length) for alg in alg_column], len(metrics)),
+    }
 
     return pd.DataFrame(data)
 
@@ -0,0 +1,194 @@
+# deltaq_sweep.py
+#
+# Runs the delta-Q model (deltaq.evaluate) over parameter spaces too large to
+# hold in memory. The flattened grid is split in chunks that are evaluated in
+# a process pool and written as Parquet parts, each with a small summary file
+# next to it, so the reductions never need the full grid in memory. A run can
+# be interrupted and started again with the same arguments; only the missing
+# chunks are computed.
+
+import glob
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from charts_helper import deltaq
+
+parameter_names = ["Q", "speed", "cycle_length", "t_alpha", "a", "k", "s"]
+
+
+def make_coords(
+    Q=deltaq.Q_vector,
+    speed=(50,),
+    cycle_length=(15,),
+    t_alpha=(deltaq.t_alpha,),
+    a=(deltaq.a,),
+    k=(deltaq.k,),
+    s=(deltaq.s,),
+):
+    values = [Q, speed, cycle_length, t_alpha, a, k, s]
+    return {
+        name: np.atleast_1d(np.asarray(v, dtype=np.float64)).tolist()
+        for name, v in zip(parameter_names, values)
+    }
+
+
+# files starting with "_" are skipped when the directory is read as a dataset
+def _part_path(output_dir, chunk):
+    return os.path.join(output_dir, "part-{:05d}.parquet".format(chunk))
+
+
+def _summary_path(output_dir, chunk):
+    return os.path.join(output_dir, "_summary-{:05d}.npz".format(chunk))
+
+
+def _tmp_path(path):
+    head, tail = os.path.split(path)
+    return os.path.join(head, "_{}.tmp".format(tail.lstrip("_")))
+
+
+def _run_chunk(output_dir, coords, chunk, start, stop):
+    shape = tuple(len(coords[name]) for name in parameter_names)
+    idx = np.unravel_index(np.arange(start, stop), shape)
+    values = {
+        name: np.asarray(coords[name])[i] for name, i in zip(parameter_names, idx)
+    }
+
+    results = deltaq.evaluate(*(values[name] for name in parameter_names))
+
+    data = dict(values)
+    data["D"] = results["D"]
+    data["feasible"] = results["feasible"]
+    for alg in deltaq.algs:
+        for name, column in results[alg].items():
+            data["{}_{}".format(alg, name)] = column
+
+    # written under a temporary name first so a killed run never leaves a
+    # partial part behind
+    part = _part_path(output_dir, chunk)
+    pd.DataFrame(data).to_parquet(_tmp_path(part), index=False)
+    os.replace(_tmp_path(part), part)
+
+    # feasibility per (speed, cycle length) cell and max delta-Q per speed
+    n_speed, n_cycle = shape[1], shape[2]
+    cell = idx[1] * n_cycle + idx[2]
+    feasible = results["feasible"]
+
+    max_feasible_q = np.full(n_speed * n_cycle, -np.inf)
+    np.maximum.at(max_feasible_q, cell[feasible], values["Q"][feasible])
+
+    summary = {
+        "points": np.bincount(cell, minlength=n_speed * n_cycle),
+        "feasible": np.bincount(cell[feasible], minlength=n_speed * n_cycle),
+        "max_feasible_q": max_feasible_q,
+    }
+    for alg in deltaq.algs:
+        valid = results[alg]["valid"]
+        max_delta_q = np.full(n_speed, -np.inf)
+        np.maximum.at(max_delta_q, idx[1][valid], results[alg]["delta_q"][valid])
+        summary["{}_max_delta_q".format(alg)] = max_delta_q
+
+    summary_file = _summary_path(output_dir, chunk)
+    with open(_tmp_path(summary_file), "wb") as f:
+        np.savez(f, **summary)
+    os.replace(_tmp_path(summary_file), summary_file)
+    return chunk
+
+
+def _check_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, "_sweep.json")
+    if os.path.exists(path):
+        with open(path) as f:
+            if json.load(f) != manifest:
+                raise ValueError(
+                    "{} holds a sweep with different parameters".format(output_dir)
+                )
+        return
+    with open(path, "w") as f:
+        json.dump(manifest, f)
+
+
+def run_sweep(output_dir, coords, chunk_size=1_000_000, workers=None):
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {"coords": coords, "chunk_size": chunk_size, "algs": deltaq.algs}
+    _check_manifest(output_dir, manifest)
+
+    total = int(np.prod([len(coords[name]) for name in parameter_names]))
+    chunks = [
+        (chunk, start, min(start + chunk_size, total))
+        for chunk, start in enumerate(range(0, total, chunk_size))
+    ]
+    pending = [c for c in chunks if not os.path.exists(_summary_path(output_dir, c[0]))]
+
+    if workers == 1 or len(pending) <= 1:
+        for chunk, start, stop in pending:
+            _run_chunk(output_dir, coords, chunk, start, stop)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_run_chunk, output_dir, coords, chunk, start, stop)
+                for chunk, start, stop in pending
+            ]
+            for future in futures:
+                future.result()
+
+    return summarize(output_dir)
+
+
+def summarize(output_dir):
+    with open(os.path.join(output_dir, "_sweep.json")) as f:
+        manifest = json.load(f)
+    coords = manifest["coords"]
+    speeds, cycles = coords["speed"], coords["cycle_length"]
+
+    totals = None
+    for path in sorted(glob.glob(os.path.join(output_dir, "_summary-*.npz"))):
+        with np.load(path) as part:
+            if totals is None:
+                totals = {name: part[name].copy() for name in part.files}
+            else:
+                for name in part.files:
+                    if name in ("points", "feasible"):
+                        totals[name] += part[name]
+                    else:
+                        totals[name] = np.maximum(totals[name], part[name])
+
+    if totals is None:
+        raise ValueError("{} holds no finished chunks".format(output_dir))
+
+    feasibility = pd.DataFrame(
+        {
+            "speed": np.repeat(speeds, len(cycles)),
+            "cycle_length": np.tile(cycles, len(speeds)),
+            "points": totals["points"],
+            "feasible": totals["feasible"],
+            "max_feasible_q": np.where(
+                np.isinf(totals["max_feasible_q"]), np.nan, totals["max_feasible_q"]
+            ),
+        }
+    )
+    feasibility["feasible_perc"] = (
+        feasibility["feasible"] / feasibility["points"]
+    ) * 100
+
+    max_delta_q = pd.DataFrame(
+        {
+            alg: np.where(
+                np.isinf(totals["{}_max_delta_q".format(alg)]),
+                np.nan,
+                totals["{}_max_delta_q".format(alg)],
+            )
+            for alg in manifest["algs"]
+        },
+        index=pd.Index(speeds, name="speed"),
+    )
+
+    return {"feasibility": feasibility, "max_delta_q": max_delta_q}
+
+
+def load_sweep(output_dir, columns=None, filters=None):
+    # filters are passed to the Parquet reader, e.g. [("speed", "==", 50.0)]
+    return pd.read_parquet(output_dir, columns=columns, filters=filters)
@@ -0,0 +1,221 @@
+# export.py
+
+import contextlib
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import plotly.io as pio
+
+from charts_helper import figcache
+from charts_helper import profiling
+
+default_formats = ["pdf", "png"]
+
+# seconds the first render of a new renderer may take before Chrome is
+# considered unable to start
+renderer_timeout = 60
+
+_renderer_running = False
+_renderer_failed = False
+_queue = None
+
+
+def _kaleido():
+    # kaleido >= 1.0 renders through Chrome and can keep it alive between calls;
+    # older releases keep their own persistent scope and are driven per figure
+    try:
+        import kaleido
+    except ImportError:
+        return None
+    if hasattr(kaleido, "start_sync_server") and hasattr(pio, "write_images"):
+        return kaleido
+    return None
+
+
+def _chrome_found():
+    try:
+        from choreographer.browsers.chromium import Chromium
+    except ImportError:
+        return False
+    return Chromium.find_browser(skip_local=False) is not None
+
+
+def _kaleido_options():
+    # the plotly.io.defaults that pio.write_images hands to kaleido
+    defaults = pio.defaults
+    options = {}
+    for name in ["plotlyjs", "mathjax", "headers"]:
+        if getattr(defaults, name, None):
+            options[name] = getattr(defaults, name)
+    return options
+
+
+def _probe(kaleido, result):
+    try:
+        kaleido.calc_fig_sync(
+            {"data": [], "layout": {}}, opts=dict(format="png", width=8, height=8)
+        )
+        result.append(None)
+    except Exception as e:
+        result.append(e)
+
+
+def start_renderer(workers=None):
+    # keeps Chrome running with one tab per worker until stop_renderer; without
+    # Chrome, or when it does not come up, every batch starts its own browser
+    # and reports the error itself
+    global _renderer_running, _renderer_failed
+
+    if _renderer_running:
+        return True
+    kaleido = _kaleido()
+    if kaleido is None or _renderer_failed or not _chrome_found():
+        return False
+    kaleido.start_sync_server(
+        n=workers or os.cpu_count(), silence_warnings=True, **_kaleido_options()
+    )
+    # a Chrome that fails to start takes the server thread down with it and
+    # every call would then wait on it forever, so the first render is bounded
+    result = []
+    probe = threading.Thread(target=_probe, args=(kaleido, result), daemon=True)
+    probe.start()
+    probe.join(renderer_timeout)
+    if result != [None]:
+        kaleido.stop_sync_server(silence_warnings=True)
+        _renderer_failed = True
+        return False
+    _renderer_running = True
+    return True
+
+
+def stop_renderer():
+    global _renderer_running
+
+    if not _renderer_running:
+        return
+    _kaleido().stop_sync_server(silence_warnings=True)
+    _renderer_running = False
+
+
+def figure_jobs(fig, figname, output_dir="figs", width=600, height=480, formats=None):
+    # the figure is validated and serialized once and shared by every format
+    fig_dict = fig.to_dict() if hasattr(fig, "to_dict") else fig
+    return [
+        {
+            "fig": fig_dict,
+            "file": "{}/{}.{}".format(output_dir, figname, fmt),
+            "format": fmt,
+            "width": width,
+            "height": height,
+        }
+        for fmt in (formats or default_formats)
+    ]
+
+
+def _write_legacy(jobs):
+    for job in jobs:
+        pio.write_image(
+            job["fig"],
+            job["file"],
+            format=job["format"],
+            width=job["width"],
+            height=job["height"],
+            validate=False,
+        )
+
+
+def _write_kaleido(kaleido, jobs, workers):
+    from kaleido.errors import ChromeNotFoundError
+
+    specs = [
+        {
+            "fig": job["fig"],
+            "path": Path(job["file"]),
+            "opts": dict(
+                format=job["format"],
+                width=job["width"],
+                height=job["height"],
+                scale=1,
+            ),
+            "topojson": getattr(pio.defaults, "topojson", None),
+        }
+        for job in jobs
+    ]
+    try:
+        if start_renderer(workers):
+            kaleido.write_fig_from_object_sync(specs, cancel_on_error=True)
+        else:
+            # a browser for this batch only, with as many tabs as there are
+            # workers
+            n = min(workers or os.cpu_count(), len(jobs))
+            kaleido.write_fig_from_object_sync(
+                specs, cancel_on_error=True, kopts=dict(n=n, **_kaleido_options())
+            )
+    except ChromeNotFoundError:
+        raise RuntimeError(
+            "exporting figures needs Chrome; install it with plotly_get_chrome"
+        ) from None
+
+
+def write_jobs(jobs, workers=None):
+    if not jobs:
+        return
+
+    with profiling.stage("render", rows=len(jobs)):
+        _write_jobs(jobs, workers)
+
+
+def _write_jobs(jobs, workers):
+    kaleido = _kaleido()
+    if kaleido is not None:
+        _write_kaleido(kaleido, jobs, workers)
+        return
+
+    workers = min(workers or os.cpu_count(), len(jobs))
+    if workers <= 1:
+        _write_legacy(jobs)
+        return
+
+    # one long-lived kaleido scope per worker process
+    chunks = [jobs[i::workers] for i in range(workers)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(_write_legacy, chunks))
+
+
+def write_figure(
+    fig, figname, output_dir="figs", width=600, height=480, formats=None, key=None
+):
+    # with a key (see figcache.fingerprint) the render is skipped when the files
+    # on disk were exported from the same inputs
+    jobs = figure_jobs(fig, figname, output_dir, width, height, formats)
+    files = [job["file"] for job in jobs]
+    if key is not None:
+        if figcache.is_fresh(output_dir, figname, key, files):
+            return
+        figcache.record(output_dir, figname, key, files)
+
+    if _queue is not None:
+        _queue.extend(jobs)
+    else:
+        write_jobs(jobs)
+
+
+@contextlib.contextmanager
+def batch(workers=None):
+    # figures written inside the block are queued and exported together on exit
+    global _queue
+
+    if _queue is not None:
+        yield _queue
+        return
+
+    _queue = []
+    try:
+        yield _queue
+        jobs = _queue
+        _queue = None
+        write_jobs(jobs, workers)
+    finally:
+        _queue = None
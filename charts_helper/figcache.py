@@ -0,0 +1,109 @@
+# figcache.py
+#
+# Keeps a small index in each output directory mapping a figure name to the
+# fingerprint of the inputs it was last exported from. export.write_figure
+# skips the render when the fingerprint still matches and the files are on
+# disk. The index only keeps the most recently used entries; evicted figures
+# are simply rendered again the next time they are requested.
+
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+
+index_name = ".figcache.json"
+cache_version = 1
+max_entries = 1000
+
+# the modules whose code shapes the exported figures
+source_files = ["helper.py", "stats.py", "export.py"]
+
+_code_version = None
+
+
+def code_version():
+    global _code_version
+
+    if _code_version is None:
+        from importlib import metadata
+
+        h = hashlib.sha256(str(cache_version).encode())
+        try:
+            h.update(metadata.version("plotly").encode())
+        except metadata.PackageNotFoundError:
+            pass
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in source_files:
+            with open(os.path.join(here, name), "rb") as f:
+                h.update(f.read())
+        _code_version = h.hexdigest()
+    return _code_version
+
+
+def fingerprint(df, **params):
+    h = hashlib.sha256(code_version().encode())
+    h.update(json.dumps(list(map(str, df.columns))).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    h.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def derive(key, **params):
+    # a key for a variant (language, size...) of the figure fingerprinted by key
+    h = hashlib.sha256(key.encode())
+    h.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def _index_path(output_dir):
+    return os.path.join(output_dir, index_name)
+
+
+def load_index(output_dir):
+    try:
+        with open(_index_path(output_dir)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_index(output_dir, index):
+    if len(index) > max_entries:
+        recent = sorted(index, key=lambda name: index[name]["used"])[-max_entries:]
+        index = {name: index[name] for name in recent}
+
+    os.makedirs(output_dir, exist_ok=True)
+    tmp = _index_path(output_dir) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    os.replace(tmp, _index_path(output_dir))
+
+
+def is_fresh(output_dir, figname, key, files):
+    index = load_index(output_dir)
+    entry = index.get(figname)
+    if entry is None or entry["key"] != key or sorted(entry["files"]) != sorted(files):
+        return False
+
+    # files older than the entry belong to an export that never finished
+    for path in files:
+        if not os.path.exists(path) or os.path.getmtime(path) < entry["time"] - 1:
+            return False
+
+    entry["used"] = time.time()
+    _save_index(output_dir, index)
+    return True
+
+
+def record(output_dir, figname, key, files):
+    index = load_index(output_dir)
+    now = time.time()
+    index[figname] = {"key": key, "files": list(files), "time": now, "used": now}
+    _save_index(output_dir, index)
+
+
+def clear(output_dir):
+    if os.path.exists(_index_path(output_dir)):
+        os.remove(_index_path(output_dir))
@@ -0,0 +1,252 @@
+# geo.py
+#
+# Route analytics over the GPS traces, on top of helper.csv_to_geo. Every
+# scenario is projected to its local UTM zone, so lengths are in metres, and
+# the boundary/expcenter outlines become polygons. The per-route metrics are
+# indexed by (scenario, ev) like the result CSVs, so they join onto them with
+# results.join(route_metrics(gps), on=["scenario", "ev"]). Pairwise work
+# (overlap, crossings, junctions) only looks at the candidate pairs returned
+# by an STRtree, never at every pair of routes.
+
+import numpy as np
+import pandas as pd
+
+from charts_helper import helper
+
+
+def project(geo_df):
+    # (scenario, ev) LineStrings in lon/lat -> {scenario: GeoDataFrame in UTM}
+    projected = {}
+    for scenario, group in geo_df.groupby(level="scenario", sort=False):
+        group = group.set_crs("EPSG:4326")
+        projected[scenario] = group.to_crs(group.estimate_utm_crs())
+    return projected
+
+
+def split_routes(geo_df):
+    # EV routes and outline polygons (a Series indexed by ev) of one scenario
+    import shapely
+
+    evs = geo_df.index.get_level_values("ev")
+    is_outline = evs.isin(helper.outline_evs)
+
+    coords, idx = shapely.get_coordinates(
+        geo_df.geometry.to_numpy()[is_outline], return_index=True
+    )
+    polygons = shapely.polygons(shapely.linearrings(coords, indices=idx))
+    areas = pd.Series(shapely.make_valid(polygons), index=evs[is_outline])
+    return geo_df[~is_outline], areas
+
+
+def route_lengths(routes):
+    import shapely
+
+    return pd.Series(
+        shapely.length(routes.geometry.to_numpy()), index=routes.index, name="length_m"
+    )
+
+
+def area_shares(routes, areas):
+    # fraction of the length of every route inside every outline
+    import shapely
+
+    lines = routes.geometry.to_numpy()
+    inside = shapely.length(
+        shapely.intersection(lines[:, None], areas.to_numpy()[None, :])
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        shares = inside / shapely.length(lines)[:, None]
+    shares = pd.DataFrame(shares, index=routes.index, columns=list(areas.index))
+    return shares.reindex(columns=helper.outline_evs).add_prefix("share_")
+
+
+def sample_routes(lines, spacing):
+    # points every `spacing` metres along each line (at the middle of each
+    # step), with the route they belong to and the length they stand for
+    import shapely
+
+    coords, vertex_route = shapely.get_coordinates(lines, return_index=True)
+    steps = np.hypot(*np.diff(coords, axis=0).T)
+    steps[vertex_route[1:] != vertex_route[:-1]] = 0
+    # distance of every vertex from the start of the first line, the lines
+    # follow each other without gaps
+    along = np.concatenate([[0], np.cumsum(steps)])
+    first = np.searchsorted(vertex_route, np.arange(len(lines)))
+
+    lengths = shapely.length(lines)
+    counts = np.maximum(np.ceil(lengths / spacing).astype(np.int64), 1)
+    route = np.repeat(np.arange(len(lines)), counts)
+    step = np.arange(len(route)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    start = step * spacing
+    weight = np.minimum(spacing, lengths[route] - start)
+    target = along[first[route]] + start + weight / 2
+
+    vertex = np.clip(
+        np.searchsorted(along, target, side="right") - 1, 0, len(coords) - 2
+    )
+    span = along[vertex + 1] - along[vertex]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.where(span > 0, (target - along[vertex]) / span, 0)
+    xy = coords[vertex] + t[:, None] * (coords[vertex + 1] - coords[vertex])
+    return shapely.points(xy), route, weight
+
+
+def route_segments(lines):
+    # every pair of consecutive vertices as its own LineString
+    import shapely
+
+    coords, route = shapely.get_coordinates(lines, return_index=True)
+    same = route[:-1] == route[1:]
+    segments = shapely.linestrings(np.stack([coords[:-1], coords[1:]], axis=1)[same])
+    return segments, route[:-1][same]
+
+
+def route_overlap(routes, width=15.0):
+    # how much of route a runs within width metres of route b, for every
+    # ordered pair of routes that come that close; measured on points sampled
+    # every width metres, so it is accurate to about one width per stretch
+    import shapely
+
+    lines = routes.geometry.to_numpy()
+    points, route, weight = sample_routes(lines, width)
+
+    # a route's bounding box covers most of the city, the tree is built over
+    # its segments instead so that it actually prunes
+    segments, segment_route = route_segments(lines)
+    point, segment = shapely.STRtree(segments).query(
+        points, predicate="dwithin", distance=width
+    )
+    near = np.unique(point * len(lines) + segment_route[segment])
+    point, other = np.divmod(near, len(lines))
+    keep = route[point] != other
+    point, other = point[keep], other[keep]
+
+    pair, pairs = pd.factorize(route[point] * len(lines) + other)
+    a, b = np.divmod(pairs, len(lines))
+    shared = np.bincount(pair, weights=weight[point])
+    return pd.DataFrame(
+        {
+            "scenario": routes.index.get_level_values("scenario")[a],
+            "ev_a": routes.index.get_level_values("ev")[a],
+            "ev_b": routes.index.get_level_values("ev")[b],
+            "shared_m": shared,
+            "overlap": shared / shapely.length(lines[a]),
+        }
+    )
+
+
+def route_crossings(routes):
+    # places where two routes meet: points where they cross and stretches
+    # they share (merged, reported at their first point with their length)
+    import shapely
+
+    lines = routes.geometry.to_numpy()
+    a, b = shapely.STRtree(lines).query(lines, predicate="intersects")
+    keep = a < b
+    a, b = a[keep], b[keep]
+
+    parts, pair = shapely.get_parts(
+        shapely.intersection(lines[a], lines[b]), return_index=True
+    )
+    is_line = shapely.get_type_id(parts) == 1
+
+    # the pieces of road two routes share come out as many short segments
+    shared = np.full(len(a), None, dtype=object)
+    line_pairs, line_idx = np.unique(pair[is_line], return_inverse=True)
+    shared[line_pairs] = shapely.line_merge(
+        shapely.multilinestrings(parts[is_line], indices=line_idx)
+    )
+    stretches, stretch_pair = shapely.get_parts(shared, return_index=True)
+
+    # crossing points at the ends of a shared stretch are part of it
+    points = parts[~is_line]
+    point_pair = pair[~is_line]
+    lone = ~shapely.dwithin(points, shared[point_pair], 1e-6)
+    points, point_pair = points[lone], point_pair[lone]
+
+    starts = shapely.get_point(stretches, 0)
+    where = np.concatenate([points, starts])
+    pair = np.concatenate([point_pair, stretch_pair])
+    return pd.DataFrame(
+        {
+            "scenario": routes.index.get_level_values("scenario")[a[pair]],
+            "ev_a": routes.index.get_level_values("ev")[a[pair]],
+            "ev_b": routes.index.get_level_values("ev")[b[pair]],
+            "kind": np.repeat(["cross", "shared"], [len(points), len(stretches)]),
+            "x": shapely.get_x(where),
+            "y": shapely.get_y(where),
+            "length_m": np.concatenate(
+                [np.zeros(len(points)), shapely.length(stretches)]
+            ),
+        }
+    )
+
+
+def crossed_junctions(routes, junctions, tolerance=10.0):
+    # junctions: id, lon, lat (e.g. the nodes of the SUMO network) of the same
+    # scenario; returns the ones each route passes within tolerance metres of,
+    # in the order the route reaches them
+    import geopandas as gpd
+    import shapely
+
+    points = (
+        gpd.GeoSeries(
+            gpd.points_from_xy(junctions["lon"], junctions["lat"]), crs="EPSG:4326"
+        )
+        .to_crs(routes.crs)
+        .to_numpy()
+    )
+    lines = routes.geometry.to_numpy()
+    route, junction = shapely.STRtree(points).query(
+        lines, predicate="dwithin", distance=tolerance
+    )
+
+    crossed = pd.DataFrame(
+        {
+            "scenario": routes.index.get_level_values("scenario")[route],
+            "ev": routes.index.get_level_values("ev")[route],
+            "junction": junctions["id"].to_numpy()[junction],
+            "position_m": shapely.line_locate_point(lines[route], points[junction]),
+            "distance_m": shapely.distance(lines[route], points[junction]),
+        }
+    )
+    return crossed.sort_values(["scenario", "ev", "position_m"], ignore_index=True)
+
+
+def route_metrics(df, junctions=None, width=15.0, tolerance=10.0):
+    # one row per EV route of a GPS frame; junctions, if given, needs a
+    # scenario column besides id, lon and lat
+    projected = project(helper.csv_to_geo(df))
+
+    frames = []
+    for scenario, geo_df in projected.items():
+        routes, areas = split_routes(geo_df)
+        if routes.empty:
+            continue
+        metrics = pd.concat([route_lengths(routes), area_shares(routes, areas)], axis=1)
+
+        overlap = route_overlap(routes, width)
+        metrics["max_overlap"] = (
+            overlap.groupby(["scenario", "ev_a"])["overlap"].max().reindex(routes.index)
+        ).fillna(0.0)
+
+        crossings = route_crossings(routes)
+        counts = pd.concat([crossings["ev_a"], crossings["ev_b"]]).value_counts()
+        metrics["n_crossings"] = (
+            counts.reindex(routes.index.get_level_values("ev")).fillna(0).to_numpy()
+        ).astype(np.int64)
+
+        if junctions is not None:
+            crossed = crossed_junctions(
+                routes, junctions[junctions["scenario"] == scenario], tolerance
+            )
+            metrics["n_junctions"] = (
+                (crossed.groupby(["scenario", "ev"]).size().reindex(routes.index))
+                .fillna(0)
+                .astype(np.int64)
+            )
+
+        frames.append(metrics)
+
+    return pd.concat(frames)
@@ -1,16 +1,14 @@
 # helper.py
 
-import locale
-
-locale.setlocale(locale.LC_ALL, "pt_BR.utf8")
 import numpy as np
 import pandas as pd
-import plotly.graph_objects as go
-from shapely.geometry import Point, LineString
-import geopandas as gpd
-import shapely.geometry
-import plotly.express as px
-import plotly.io as pio
+
+from charts_helper import figcache
+from charts_helper import profiling
+from charts_helper import stats
+
+# geopandas, shapely and plotly are imported by the functions that use them,
+# so importing this module for the labels or the statistics stays cheap
 
 evs_name = {
     "en": {
@@ -65,6 +63,8 @@ algs_name = {
     },
 }
 
+outline_evs = ["boundary", "expcenter"]
+
 algs_order = [
     "rfid",
     "fuzzy",
@@ -168,41 +168,123 @@ title_label = {
 
 
 def get_quartiles_data(values_list, label):
-    df = pd.DataFrame(sorted(values_list))
-    mediana = df[0].median()
-    q1 = df[0].quantile(0.25, interpolation="midpoint")
-    q3 = df[0].quantile(0.75, interpolation="midpoint")
-
-    iqr = q3 - q1
-    lower_fence = q1 - (1.5 * iqr)
-    upper_fence = q3 + (1.5 * iqr)
-
-    min_value = df[0].iloc[0]
-    max_value = df[0].iloc[-1]
-
-    for i in df[0]:
-        if i >= lower_fence:
-            lower_fence = i
-            break
-
-    for i in df[0].loc[::-1]:
-        if i <= upper_fence:
-            upper_fence = i
-            break
-
-    min_value = (
-        locale.format_string("%.2f", min_value) if min_value < lower_fence else " - "
-    )
-    max_value = (
-        locale.format_string("%.2f", max_value) if max_value > upper_fence else " - "
-    )
-    print(
-        locale.format_string(
-            "%s & %s & %.2f & %.2f & %.2f & %.2f & %.2f & %s \\\\",
-            (label, min_value, lower_fence, q1, mediana, q3, upper_fence, max_value),
-            grouping=True,
+    df = pd.DataFrame({"group": 0, "value": values_list})
+    table = stats.quartiles_table(df, "value", by=["group"])
+    print(stats.latex_row(label, table.iloc[0]))
+
+
+def boxplot_grouped_data(df, metric, precomputed=False):
+    # everything make_boxplot_grouped needs that does not depend on the language
+    df = df[df[metric].notnull()]
+    data = stats.trim_groups(df, metric, by=["alg", "ev"])
+    table = stats.quartiles_table(data, metric, by=["alg", "ev"])
+    if precomputed:
+        table["outliers"] = stats.outliers(data, metric, table, by=["alg", "ev"])
+
+    ev_codes, ev_values = pd.factorize(data["ev"])
+    return {
+        "metric": metric,
+        "table": table,
+        "values": data[metric].to_numpy(),
+        "ev_codes": ev_codes,
+        "ev_values": list(ev_values),
+        "positions": data.groupby("alg", sort=False, observed=True).indices,
+        "precomputed": precomputed,
+    }
+
+
+def boxplot_grouped_figure(data, title_label, lang="en"):
+    import plotly.graph_objects as go
+
+    table = data["table"]
+    positions = data["positions"]
+    labels = np.array([evs_name[lang][ev] for ev in data["ev_values"]], dtype=object)
+    xlabels = labels[data["ev_codes"]]
+
+    fig = go.Figure()
+
+    for alg in [alg for alg in algs_order if alg in positions]:
+        print("{}: ".format(alg))
+        for ev, row in table.loc[alg].iterrows():
+            print(stats.latex_row(evs_name[lang][ev], row))
+        print()
+
+        if data["precomputed"]:
+            rows = table.loc[alg]
+            fig.add_trace(
+                stats_box_trace(
+                    rows,
+                    [evs_name[lang][ev] for ev in rows.index],
+                    algs_name[lang][alg],
+                    outliers=list(rows["outliers"]),
+                )
+            )
+            continue
+
+        fig.add_trace(
+            go.Box(
+                y=data["values"][positions[alg]],
+                x=xlabels[positions[alg]],
+                name=algs_name[lang][alg],
+            )
         )
+
+    fig.update_layout(
+        yaxis_title=y_axis_labels[lang][data["metric"]],
+        title=title_label,
+        boxmode="group",
+        font=dict(size=14),
     )
+    return fig
+
+
+def make_boxplot_grouped_langs(
+    df,
+    metric,
+    titles,
+    figname,
+    output_dirs,
+    width=600,
+    height=480,
+    cache=True,
+    show=True,
+    precomputed=False,
+):
+    # titles and output_dirs map a language to its title and directory; the
+    # statistics are computed once and every language only relabels them.
+    # Returns the figures by language (output_dir None only builds them)
+    df = df[df[metric].notnull()]
+    key = None
+    if cache and any(d is not None for d in output_dirs.values()):
+        key = figcache.fingerprint(
+            df[["alg", "ev", metric]],
+            kind="boxplot_grouped",
+            metric=metric,
+            precomputed=precomputed,
+        )
+    profile = dict(figure=figname, rows=len(df), kind="boxplot_grouped")
+
+    with profiling.stage("quartiles", **profile):
+        data = boxplot_grouped_data(df, metric, precomputed)
+
+    figures = {}
+    for lang, title_label in titles.items():
+        with profiling.stage("traces", lang=lang, **profile):
+            fig = boxplot_grouped_figure(data, title_label, lang)
+        figures[lang] = fig
+        _show_and_write(
+            fig,
+            figname,
+            output_dirs.get(lang),
+            width,
+            height,
+            key,
+            show,
+            profile,
+            lang=lang,
+            title=title_label,
+        )
+    return figures
 
 
 def make_boxplot_grouped(
@@ -214,49 +296,111 @@ def make_boxplot_grouped(
     height=480,
     lang="en",
     output_dir="figs",
+    cache=True,
+    show=True,
+    precomputed=False,
 ):
-    evs = sorted(df["ev"].unique().tolist())
-    algs = df["alg"].unique().tolist()
+    # with output_dir=None the figure is built but not exported
+    make_boxplot_grouped_langs(
+        df,
+        metric,
+        {lang: title_label},
+        figname,
+        {lang: output_dir},
+        width,
+        height,
+        cache,
+        show,
+        precomputed,
+    )
 
-    df = df[df[metric].notnull()]
 
-    fig = go.Figure()
+def boxplot_data(df, metric, precomputed=False):
+    df = df[(df["alg"] == "no-preemption") & df[metric].notnull()]
+    data = stats.trim_groups(df, metric, by=["ev"])
+    table = stats.quartiles_table(data, metric, by=["ev"])
+    if precomputed:
+        table["outliers"] = stats.outliers(data, metric, table, by=["ev"])
 
-    for alg in [alg for alg in algs_order if alg in algs]:
-        complete_values = []
-        xlabels = []
-        print("{}: ".format(alg))
-        for ev in evs:
-            tmp_df = df[(df["alg"] == alg) & (df["ev"] == ev)][metric]
-            values = tmp_df.nlargest(tmp_df.size - 1).tolist()
-            xlabels += [evs_name[lang][ev]] * len(values)
-            complete_values += values
-            get_quartiles_data(values, evs_name[lang][ev])
-        print()
+    return {
+        "metric": metric,
+        "table": table,
+        "values": data[metric].to_numpy(),
+        "positions": data.groupby("ev", sort=False, observed=True).indices,
+        "precomputed": precomputed,
+    }
 
-        fig.add_trace(go.Box(y=complete_values, x=xlabels, name=algs_name[lang][alg]))
+
+def boxplot_figure(data, title_label, lang="en"):
+    import plotly.graph_objects as go
+
+    table = data["table"]
+
+    fig = go.Figure()
+
+    for ev, row in table.iterrows():
+        if data["precomputed"]:
+            label = evs_name[lang][ev]
+            fig.add_trace(
+                stats_box_trace(
+                    table.loc[[ev]], [label], label, outliers=[row["outliers"]]
+                )
+            )
+        else:
+            fig.add_trace(
+                go.Box(y=data["values"][data["positions"][ev]], name=evs_name[lang][ev])
+            )
+        print(stats.latex_row(evs_name[lang][ev], row))
 
     fig.update_layout(
-        yaxis_title=y_axis_labels[lang][metric],
+        yaxis_title=y_axis_labels[lang][data["metric"]],
         title=title_label,
-        boxmode="group",
         font=dict(size=14),
     )
-    fig.show()
-    pio.write_image(
-        fig,
-        "{}/{}.pdf".format(output_dir, figname),
-        format="pdf",
-        width=width,
-        height=height,
-    )
-    pio.write_image(
-        fig,
-        "{}/{}.png".format(output_dir, figname),
-        format="png",
-        width=width,
-        height=height,
-    )
+    return fig
+
+
+def make_boxplot_langs(
+    df,
+    metric,
+    titles,
+    figname,
+    output_dirs,
+    width=600,
+    height=480,
+    cache=True,
+    show=True,
+    precomputed=False,
+):
+    df = df[(df["alg"] == "no-preemption") & df[metric].notnull()]
+    key = None
+    if cache and any(d is not None for d in output_dirs.values()):
+        key = figcache.fingerprint(
+            df[["ev", metric]], kind="boxplot", metric=metric, precomputed=precomputed
+        )
+    profile = dict(figure=figname, rows=len(df), kind="boxplot")
+
+    with profiling.stage("quartiles", **profile):
+        data = boxplot_data(df, metric, precomputed)
+
+    figures = {}
+    for lang, title_label in titles.items():
+        with profiling.stage("traces", lang=lang, **profile):
+            fig = boxplot_figure(data, title_label, lang)
+        figures[lang] = fig
+        _show_and_write(
+            fig,
+            figname,
+            output_dirs.get(lang),
+            width,
+            height,
+            key,
+            show,
+            profile,
+            lang=lang,
+            title=title_label,
+        )
+    return figures
 
 
 def make_boxplot(
@@ -268,111 +412,440 @@ def make_boxplot(
     height=480,
     lang="en",
     output_dir="figs",
+    cache=True,
+    show=True,
+    precomputed=False,
 ):
-    evs = sorted(df["ev"].unique().tolist())
+    make_boxplot_langs(
+        df,
+        metric,
+        {lang: title_label},
+        figname,
+        {lang: output_dir},
+        width,
+        height,
+        cache,
+        show,
+        precomputed,
+    )
 
-    fig = go.Figure()
 
-    df = df[df[metric].notnull()]
+def _show_and_write(
+    fig, figname, output_dir, width, height, key, show, profile, **params
+):
+    # key fingerprints the data; the language, title and size are added here
+    from charts_helper import export
+
+    if show:
+        with profiling.stage("show", **profile):
+            fig.show()
+    if output_dir is None:
+        return
+    if key is not None:
+        key = figcache.derive(key, width=width, height=height, **params)
+    with profiling.stage("export", **profile):
+        export.write_figure(fig, figname, output_dir, width, height, key=key)
+
+
+def stats_box_trace(table, labels, name, outliers=None):
+    # a box per row of a quartiles table, drawn from the precomputed values;
+    # without the outlier samples only the extremes the table knows about are
+    # drawn as points
+    import plotly.graph_objects as go
+
+    if outliers is None:
+        outliers = [
+            [v for v in (row.min_outlier, row.max_outlier) if not np.isnan(v)]
+            for row in table.itertuples()
+        ]
+    return go.Box(
+        x=labels,
+        q1=table["q1"].to_numpy(),
+        median=table["median"].to_numpy(),
+        q3=table["q3"].to_numpy(),
+        lowerfence=table["lower_fence"].to_numpy(),
+        upperfence=table["upper_fence"].to_numpy(),
+        y=outliers,
+        boxpoints="outliers",
+        name=name,
+    )
 
-    for ev in evs:
-        tmp_df = df[(df["alg"] == "no-preemption") & (df["ev"] == ev)][metric]
-        dataframe = tmp_df.nlargest(tmp_df.size - 1).tolist()
-        fig.add_trace(go.Box(y=dataframe, name=evs_name[lang][ev]))
-        get_quartiles_data(dataframe, evs_name[lang][ev])
 
-    fig.update_layout(
-        yaxis_title=y_axis_labels[lang][metric], title=title_label, font=dict(size=14)
-    )
+def make_boxplot_grouped_from_table(
+    table,
+    metric,
+    title_label,
+    figname,
+    width=600,
+    height=480,
+    lang="en",
+    output_dir="figs",
+    cache=True,
+    show=True,
+):
+    # table indexed by (alg, ev), as built by stats.quartiles_table or
+    # sketch.summaries_table (select one scenario with table.xs first)
+    import plotly.graph_objects as go
+
+    key = None
+    if cache and output_dir is not None:
+        key = figcache.fingerprint(
+            table.reset_index(), kind="boxplot_grouped_table", metric=metric
+        )
+
+    profile = dict(figure=figname, rows=len(table), kind="boxplot_grouped_table")
 
-    fig.show()
-    pio.write_image(
+    with profiling.stage("traces", **profile):
+        fig = go.Figure()
+        algs = table.index.get_level_values("alg")
+
+        for alg in [alg for alg in algs_order if alg in algs]:
+            rows = table.loc[alg]
+            labels = [evs_name[lang][ev] for ev in rows.index]
+            print("{}: ".format(alg))
+            for label, (_, row) in zip(labels, rows.iterrows()):
+                print(stats.latex_row(label, row))
+            print()
+
+            fig.add_trace(stats_box_trace(rows, labels, algs_name[lang][alg]))
+
+        fig.update_layout(
+            yaxis_title=y_axis_labels[lang][metric],
+            title=title_label,
+            boxmode="group",
+            font=dict(size=14),
+        )
+    _show_and_write(
         fig,
-        "{}/{}.pdf".format(output_dir, figname),
-        format="pdf",
-        width=width,
-        height=height,
+        figname,
+        output_dir,
+        width,
+        height,
+        key,
+        show,
+        profile,
+        lang=lang,
+        title=title_label,
     )
-    pio.write_image(
+
+
+def make_boxplot_from_table(
+    table,
+    metric,
+    title_label,
+    figname,
+    width=600,
+    height=480,
+    lang="en",
+    output_dir="figs",
+    cache=True,
+    show=True,
+):
+    # make_boxplot from a table indexed by ev, e.g. the no-preemption rows of
+    # sketch.summaries_table (table.xs(("turin", "no-preemption")))
+    import plotly.graph_objects as go
+
+    key = None
+    if cache and output_dir is not None:
+        key = figcache.fingerprint(
+            table.reset_index(), kind="boxplot_table", metric=metric
+        )
+
+    profile = dict(figure=figname, rows=len(table), kind="boxplot_table")
+
+    with profiling.stage("traces", **profile):
+        fig = go.Figure()
+        for ev in table.index:
+            label = evs_name[lang][ev]
+            fig.add_trace(stats_box_trace(table.loc[[ev]], [label], label))
+            print(stats.latex_row(label, table.loc[ev]))
+
+        fig.update_layout(
+            yaxis_title=y_axis_labels[lang][metric],
+            title=title_label,
+            font=dict(size=14),
+        )
+    _show_and_write(
         fig,
-        "{}/{}.png".format(output_dir, figname),
-        format="png",
-        width=width,
-        height=height,
+        figname,
+        output_dir,
+        width,
+        height,
+        key,
+        show,
+        profile,
+        lang=lang,
+        title=title_label,
     )
 
 
 def csv_to_geo(df):
-    geometry = [Point(xy) for xy in zip(df.lon, df.lat)]
-    geo_df = gpd.GeoDataFrame(df, geometry=geometry)
+    import geopandas as gpd
+    import shapely
 
-    geo_df2 = geo_df.groupby(["scenario", "ev"])["geometry"].apply(
-        lambda x: LineString(x.tolist())
-    )
-    return gpd.GeoDataFrame(geo_df2, geometry="geometry")
+    df = df.sort_values(["scenario", "ev", "step"], kind="mergesort")
+    sizes = df.groupby(["scenario", "ev"], sort=False, observed=True).size()
 
+    # one LineString per (scenario, ev), built straight from the coordinate arrays
+    geometry = shapely.linestrings(
+        df["lon"].to_numpy(dtype=np.float64),
+        df["lat"].to_numpy(dtype=np.float64),
+        indices=np.repeat(np.arange(len(sizes)), sizes.to_numpy()),
+    )
+    return gpd.GeoDataFrame({"geometry": geometry}, index=sizes.index)
 
-def make_map(
-    df, zoom, title, figname, width=600, height=480, lang="en", output_dir="figs"
-):
-    geo_df = csv_to_geo(df)
-    lats = []
-    lons = []
-    names = []
-    colors = []
 
-    for index, row in geo_df.iterrows():
-        feature = row["geometry"]
+def route_traces(geo_df, lang="en"):
+    # lang=None keeps the ev keys of the outlines, see relabel_routes
+    import shapely
 
+    route_names = []
+    for scenario, ev in geo_df.index:
         try:
-            name = int(index[1])
+            route_names.append(int(ev))
         except ValueError:
-            name = evs_name[lang][index[1]]
+            route_names.append(ev if lang is None else evs_name[lang][ev])
+
+    # one part per LineString, MultiLineStrings contribute each of their parts
+    parts, route_idx = shapely.get_parts(geo_df.geometry.to_numpy(), return_index=True)
+    is_line = shapely.get_type_id(parts) == 1
+    parts = parts[is_line]
+    part_names = np.empty(len(parts), dtype=object)
+    part_names[:] = [route_names[i] for i in route_idx[is_line]]
+
+    coords, part_idx = shapely.get_coordinates(parts, return_index=True)
+    counts = np.bincount(part_idx, minlength=len(parts))
+
+    # every part is followed by a None separator
+    size = len(coords) + len(parts)
+    positions = np.arange(len(coords)) + part_idx
+
+    lats = np.full(size, None, dtype=object)
+    lons = np.full(size, None, dtype=object)
+    names = np.full(size, None, dtype=object)
+    lats[positions] = coords[:, 1]
+    lons[positions] = coords[:, 0]
+    names[positions] = part_names[part_idx]
+    colors = np.repeat(part_names, counts + 1)
+
+    return lats, lons, names, colors
+
+
+def decimate_steps(df, stride):
+    # keeps every stride-th point of each route and always its last point, the
+    # area outlines are left untouched
+    df = df.sort_values(["scenario", "ev", "step"], kind="mergesort")
+    groups = df.groupby(["scenario", "ev"], sort=False, observed=True)
+    keep = (
+        (groups.cumcount() % stride == 0)
+        | (groups.cumcount(ascending=False) == 0)
+        | df["ev"].isin(outline_evs)
+    )
+    return df[keep]
 
-        if isinstance(feature, shapely.geometry.linestring.LineString):
-            linestrings = [feature]
-        elif isinstance(feature, shapely.geometry.multilinestring.MultiLineString):
-            linestrings = feature.geoms
-        else:
-            continue
-        for linestring in linestrings:
-            x, y = linestring.xy
-            lats = np.append(lats, y)
-            lons = np.append(lons, x)
-            names = np.append(names, [name] * len(y))
-            lats = np.append(lats, None)
-            lons = np.append(lons, None)
-            names = np.append(names, None)
-            colors = np.append(colors, [name] * (len(y) + 1))
-
-    lat_extreme = df[df["ev"] == "boundary"]["lat"].unique()
-    lon_extreme = df[df["ev"] == "boundary"]["lon"].unique()
-
-    fig = px.line_mapbox(
-        lat=lats,
-        lon=lons,
-        hover_name=names,
-        mapbox_style="open-street-map",
+
+def relabel_routes(names, lang="en"):
+    # names of route_traces(geo_df, lang=None) in the given language
+    codes, uniques = pd.factorize(names)
+    labels = np.empty(len(uniques) + 1, dtype=object)
+    labels[:-1] = [evs_name[lang].get(name, name) for name in uniques]
+    return labels[codes]
+
+
+def simplify_routes(geo_df, tolerance):
+    # Douglas-Peucker in a local UTM projection, so the tolerance is in metres
+    geo_df = geo_df.set_crs("EPSG:4326")
+    projected = geo_df.to_crs(geo_df.estimate_utm_crs())
+    projected["geometry"] = projected.geometry.simplify(tolerance)
+    return projected.to_crs("EPSG:4326").set_crs(None, allow_override=True)
+
+
+def simplify_map_data(df, tolerance=None, stride=None):
+    import shapely
+
+    points = df.groupby(["scenario", "ev"], observed=True).size()
+
+    if stride is not None and stride > 1:
+        df = decimate_steps(df, stride)
+    geo_df = csv_to_geo(df)
+    if tolerance is not None and tolerance > 0:
+        geo_df = simplify_routes(geo_df, tolerance)
+
+    kept = pd.Series(
+        shapely.get_num_coordinates(geo_df.geometry.to_numpy()), index=geo_df.index
+    )
+    report = pd.DataFrame({"points": points, "kept": kept})
+    report["kept_perc"] = (report["kept"] / report["points"]) * 100
+    return geo_df, report
+
+
+def map_data(df, tolerance=None, stride=None):
+    if tolerance is None and stride is None:
+        geo_df = csv_to_geo(df)
+    else:
+        geo_df, report = simplify_map_data(df, tolerance, stride)
+        print(report.to_string())
+        print()
+
+    lats, lons, names, colors = route_traces(geo_df, lang=None)
+    boundary = df[df["ev"] == "boundary"]
+    return {
+        "lats": lats,
+        "lons": lons,
+        "names": names,
+        "colors": colors,
+        "center": {
+            "lat": np.mean(boundary["lat"].unique()),
+            "lon": np.mean(boundary["lon"].unique()),
+        },
+        "extent": {
+            "lat": [boundary["lat"].min(), boundary["lat"].max()],
+            "lon": [boundary["lon"].min(), boundary["lon"].max()],
+        },
+    }
+
+
+def offline_map_figure(data, title, lang="en", margin=0.05):
+    # the routes on plain axes instead of map tiles, so exporting needs no
+    # network; one degree of latitude is drawn 1/cos(lat) times longer than
+    # one of longitude, which is what the Web Mercator tiles look like at
+    # the scale of a city. The view spans the boundary plus margin on each side
+    import plotly.express as px
+
+    fig = px.line(
+        x=data["lons"],
+        y=data["lats"],
+        hover_name=relabel_routes(data["names"], lang),
+        color=relabel_routes(data["colors"], lang),
+        title=title,
+        labels={"x": "lon", "y": "lat", "color": ""},
+    )
+
+    lon_range = np.array(data["extent"]["lon"], dtype=np.float64)
+    lat_range = np.array(data["extent"]["lat"], dtype=np.float64)
+    lon_range += np.array([-1, 1]) * margin * np.ptp(lon_range)
+    lat_range += np.array([-1, 1]) * margin * np.ptp(lat_range)
+
+    axis = dict(visible=False, showgrid=False, zeroline=False)
+    fig.update_xaxes(range=lon_range, constrain="domain", **axis)
+    fig.update_yaxes(
+        range=lat_range,
+        scaleanchor="x",
+        scaleratio=1 / np.cos(np.radians(data["center"]["lat"])),
+        constrain="domain",
+        **axis,
+    )
+    fig.update_layout(
+        margin={"r": 0, "t": 50, "l": 0, "b": 0},
+        font=dict(size=14),
+        plot_bgcolor="white",
+    )
+    return fig
+
+
+def map_figure(data, zoom, title, lang="en", offline=False):
+    # offline=True ignores zoom, the view is fitted to the boundary instead
+    if offline:
+        return offline_map_figure(data, title, lang)
+
+    import plotly.express as px
+
+    # plotly 7 dropped the mapbox traces for their MapLibre equivalents
+    if hasattr(px, "line_mapbox"):
+        line_map, style = px.line_mapbox, {"mapbox_style": "open-street-map"}
+    else:
+        line_map, style = px.line_map, {"map_style": "open-street-map"}
+    fig = line_map(
+        lat=data["lats"],
+        lon=data["lons"],
+        hover_name=relabel_routes(data["names"], lang),
         zoom=zoom,
-        color=colors,
+        color=relabel_routes(data["colors"], lang),
         title=title,
-        center={"lat": np.mean(lat_extreme), "lon": np.mean(lon_extreme)},
+        center=data["center"],
+        **style,
     )
     fig.update_layout(margin={"r": 0, "t": 50, "l": 0, "b": 0}, font=dict(size=14))
-    fig.show()
-    pio.write_image(
-        fig,
-        "{}/{}.pdf".format(output_dir, figname),
-        format="pdf",
-        width=width,
-        height=height,
-    )
-    pio.write_image(
-        fig,
-        "{}/{}.png".format(output_dir, figname),
-        format="png",
-        width=width,
-        height=height,
+    return fig
+
+
+def make_map_langs(
+    df,
+    zoom,
+    titles,
+    figname,
+    output_dirs,
+    width=600,
+    height=480,
+    tolerance=None,
+    stride=None,
+    cache=True,
+    show=True,
+    offline=False,
+):
+    key = None
+    if cache and any(d is not None for d in output_dirs.values()):
+        key = figcache.fingerprint(
+            df[["scenario", "ev", "step", "lon", "lat"]],
+            kind="map",
+            zoom=zoom,
+            tolerance=tolerance,
+            stride=stride,
+            offline=offline,
+        )
+    profile = dict(figure=figname, rows=len(df), kind="map")
+
+    with profiling.stage("geometry", **profile):
+        data = map_data(df, tolerance, stride)
+
+    figures = {}
+    for lang, title in titles.items():
+        with profiling.stage("traces", lang=lang, **profile):
+            fig = map_figure(data, zoom, title, lang, offline)
+        figures[lang] = fig
+        _show_and_write(
+            fig,
+            figname,
+            output_dirs.get(lang),
+            width,
+            height,
+            key,
+            show,
+            profile,
+            lang=lang,
+            title=title,
+        )
+    return figures
+
+
+def make_map(
+    df,
+    zoom,
+    title,
+    figname,
+    width=600,
+    height=480,
+    lang="en",
+    output_dir="figs",
+    tolerance=None,
+    stride=None,
+    cache=True,
+    show=True,
+    offline=False,
+):
+    make_map_langs(
+        df,
+        zoom,
+        {lang: title},
+        figname,
+        {lang: output_dir},
+        width,
+        height,
+        tolerance,
+        stride,
+        cache,
+        show,
+        offline,
     )
 
 
@@ -0,0 +1,89 @@
+# loader.py
+
+import glob
+import hashlib
+import os
+
+import pandas as pd
+
+from charts_helper import profiling
+
+default_cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "charts_helper")
+cache_version = 2
+
+categorical_columns = ["scenario", "ev", "alg"]
+
+# columns whose logged values float32 holds exactly (ttt is a whole number of
+# seconds below 2**24); rt reaches eight significant digits and the
+# avg_trip_* quartiles shift at the second decimal, so they stay float64
+float32_columns = ["ttt"]
+
+column_dtypes = {
+    "instance": "Int16",
+    "seed": "Int32",
+    "n_teleported": "Int32",
+    "teleported": "boolean",
+}
+
+
+def parse_results(path):
+    header = pd.read_csv(path, nrows=0).columns
+    dtypes = {c: "category" for c in categorical_columns if c in header}
+    dtypes.update({c: t for c, t in column_dtypes.items() if c in header})
+
+    df = pd.read_csv(path, dtype=dtypes)
+
+    # derived columns are computed before any downcast
+    if "tl" in df and "ttt" in df:
+        df["tl-ttt"] = (df["tl"] / df["ttt"]) * 100
+
+    for column in float32_columns:
+        if column in df:
+            df[column] = df[column].astype("float32")
+    return df
+
+
+def _cache_path(path, cache_dir, suffix=".parquet"):
+    stat = os.stat(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    source = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:8]
+    state = hashlib.sha1(
+        "{}:{}:{}".format(stat.st_size, stat.st_mtime_ns, cache_version).encode()
+    ).hexdigest()[:8]
+    prefix = os.path.join(cache_dir, "{}-{}".format(name, source))
+    return prefix, "{}-{}{}".format(prefix, state, suffix)
+
+
+def load_results(path, cache=True, cache_dir=None):
+    path = os.path.expanduser(path)
+    with profiling.stage("load", path=path) as info:
+        df = _load_results(path, cache, cache_dir)
+        info["rows"] = len(df)
+    return df
+
+
+def _load_results(path, cache, cache_dir):
+    if not cache:
+        return parse_results(path)
+
+    prefix, cached = _cache_path(path, cache_dir or default_cache_dir)
+    if os.path.exists(cached):
+        return pd.read_parquet(cached)
+
+    df = parse_results(path)
+    try:
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        df.to_parquet(cached, index=False)
+    except ImportError:
+        # no parquet engine installed, the parsed frame is still usable
+        return df
+
+    for stale in glob.glob("{}-*.parquet".format(prefix)):
+        if stale != cached:
+            os.remove(stale)
+    return df
+
+
+def split_results(df):
+    no_preemption = df["alg"] == "no-preemption"
+    return df[~no_preemption], df[no_preemption]
@@ -1,10 +1,13 @@
 # old_helper.py
 
+import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import scipy.stats as st
 import plotly.io as pio
 
+from charts_helper import profiling
+
 instances = [1, 2, 3, 4, 5]
 
 nvec = {
@@ -80,23 +83,66 @@ y_axis_labels = {
 x_axis_labels = {"en": "Number of Vehicles", "br": "Número de Veículos"}
 
 
-def get_values(df_sce, metric, scenario):
-    x_values = [nvec[scenario][i] for i in instances]
-    count = dict(
-        [(i, df_sce[df_sce["instance"] == i][metric].count()) for i in instances]
-    )
-    means = dict(
-        [(i, df_sce[df_sce["instance"] == i][metric].mean()) for i in instances]
-    )
-    std_err = dict(
-        [(i, st.sem(df_sce[df_sce["instance"] == i][metric])) for i in instances]
-    )
-    y_errors = [
-        means[i] - st.t.interval(0.95, count[i] - 1, loc=means[i], scale=std_err[i])[0]
-        for i in instances
-    ]
+def vehicle_counts(df_sce, scenario, counts=None):
+    # vehicles of every instance: counts ({instance: vehicles}) if given, else
+    # an n_vehicles column, else nvec[scenario]
+    instances = sorted(df_sce["instance"].unique().tolist())
+    if counts is None and "n_vehicles" in df_sce:
+        counts = df_sce.groupby("instance", observed=True)["n_vehicles"].first()
+    if counts is None:
+        counts = nvec.get(scenario, {})
+    missing = [i for i in instances if i not in counts]
+    if missing:
+        raise ValueError(
+            "no vehicle count for instances {} of {!r}; pass counts or add an "
+            "n_vehicles column".format(missing, scenario)
+        )
+    return [counts[i] for i in instances]
 
-    return x_values, [means[i] for i in means], y_errors
+
+def ci_table(
+    df,
+    metric,
+    by=("scenario", "alg", "instance"),
+    confidence=0.95,
+    bootstrap=0,
+    seed=None,
+):
+    by = list(by)
+    data = df.loc[df[metric].notnull(), by + [metric]]
+    groups = data.groupby(by, observed=True)[metric]
+
+    table = groups.agg(["count", "mean", "std"])
+    table.columns = ["n", "mean", "std"]
+    table["sem"] = table["std"] / np.sqrt(table["n"])
+    half_width = st.t.ppf((1 + confidence) / 2, table["n"] - 1) * table["sem"]
+    table["ci_low"] = table["mean"] - half_width
+    table["ci_high"] = table["mean"] + half_width
+
+    if bootstrap:
+        # percentile intervals of the mean, one (bootstrap x n) index matrix per group
+        rng = np.random.default_rng(seed)
+        alpha = (1 - confidence) / 2
+        bounds = []
+        for _, values in groups:
+            values = values.to_numpy(dtype=np.float64)
+            idx = rng.integers(0, len(values), size=(bootstrap, len(values)))
+            means = values[idx].mean(axis=1)
+            bounds.append(np.quantile(means, [alpha, 1 - alpha]))
+        bounds = np.array(bounds).reshape(-1, 2)
+        table["boot_low"] = bounds[:, 0]
+        table["boot_high"] = bounds[:, 1]
+
+    return table
+
+
+def get_values(df_sce, metric, scenario, counts=None):
+    with profiling.stage("ci_table", rows=len(df_sce), metric=metric):
+        table = ci_table(df_sce, metric, by=["instance"])
+    x_values = vehicle_counts(df_sce[df_sce[metric].notnull()], scenario, counts)
+    y_errors = (table["mean"] - table["ci_low"]).tolist()
+
+    return x_values, table["mean"].tolist(), y_errors
 
 
 def make_line_graph(df, scenario):
@@ -154,7 +200,8 @@ def make_line_graph(df, scenario):
         title_text="Time-Loss/Actual Travel Time (%)", secondary_y=True, range=[0, 100]
     )
 
-    fig.show()
+    with profiling.stage("show", rows=len(df_sce), kind="line_graph"):
+        fig.show()
 
 
 def make_bar_graph(df, scenario, alg):
@@ -189,7 +236,8 @@ def make_bar_graph(df, scenario, alg):
     )
 
     fig.update_layout(barmode="group")
-    fig.show()
+    with profiling.stage("show", rows=len(df_sce), kind="bar_graph"):
+        fig.show()
 
 
 def make_boxplot_grouped(
@@ -226,14 +274,17 @@ def make_boxplot_grouped(
         boxmode="group",
         font=dict(size=14),
     )
-    fig.show()
-    pio.write_image(
-        fig,
-        "{}/{}.pdf".format(output_dir, figname),
-        format="pdf",
-        width=width,
-        height=height,
-    )
+    profile = dict(figure=figname, rows=len(df), kind="old_boxplot_grouped")
+    with profiling.stage("show", **profile):
+        fig.show()
+    with profiling.stage("export", **profile):
+        pio.write_image(
+            fig,
+            "{}/{}.pdf".format(output_dir, figname),
+            format="pdf",
+            width=width,
+            height=height,
+        )
 
 
 def make_boxplot(
@@ -268,11 +319,14 @@ def make_boxplot(
         font=dict(size=14),
     )
 
-    fig.show()
-    pio.write_image(
-        fig,
-        "{}/{}.pdf".format(output_dir, figname),
-        format="pdf",
-        width=width,
-        height=height,
-    )
+    profile = dict(figure=figname, rows=len(df), kind="old_boxplot")
+    with profiling.stage("show", **profile):
+        fig.show()
+    with profiling.stage("export", **profile):
+        pio.write_image(
+            fig,
+            "{}/{}.pdf".format(output_dir, figname),
+            format="pdf",
+            width=width,
+            height=height,
+        )
@@ -0,0 +1,143 @@
+# profiling.py
+#
+# Opt-in stage timers for the charting pipeline. The helpers wrap their steps
+# (load, filter, quartiles, traces, show, export...) in profiling.stage; while
+# profiling is off a stage costs one attribute lookup. Once enabled, every
+# stage appends a record with its wall time, the tracemalloc high-water mark
+# reached inside it, the figure it belongs to and the rows it processed.
+# Records are kept in memory and, when a path is given, appended to a JSON
+# lines file as they finish.
+#
+#   with profiling.session("profile.jsonl"):
+#       helper.make_boxplot_grouped(...)
+#
+# prints profiling.summary() at the end of the block.
+
+import contextlib
+import json
+import time
+import tracemalloc
+
+enabled = False
+
+_records = []
+_stack = []
+_output = None
+_memory = True
+_started_tracemalloc = False
+
+
+def enable(path=None, memory=True):
+    global enabled, _output, _memory, _started_tracemalloc
+
+    _output = path
+    _memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+    enabled = True
+
+
+def disable():
+    global enabled, _output, _started_tracemalloc
+
+    enabled = False
+    _output = None
+    if _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+
+
+def reset():
+    _records.clear()
+
+
+def records():
+    return list(_records)
+
+
+def _emit(record):
+    _records.append(record)
+    if _output is not None:
+        with open(_output, "a") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+
+
+@contextlib.contextmanager
+def stage(name, figure=None, rows=None, **fields):
+    # yields a dict the caller may update, e.g. with the rows it loaded
+    info = dict(fields, figure=figure, rows=rows)
+    if not enabled:
+        yield info
+        return
+
+    frame = {"name": name, "peak": 0}
+    if _memory:
+        # the peak is reset for every stage, the outer stage keeps the
+        # high-water mark reached before the inner one started
+        current, peak = tracemalloc.get_traced_memory()
+        if _stack:
+            _stack[-1]["peak"] = max(_stack[-1]["peak"], peak)
+        frame["base"] = current
+        tracemalloc.reset_peak()
+    _stack.append(frame)
+
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        elapsed = time.perf_counter() - start
+        _stack.pop()
+
+        record = {
+            "stage": name,
+            "figure": info.pop("figure"),
+            "rows": info.pop("rows"),
+            "seconds": elapsed,
+        }
+        if _memory:
+            peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+            if _stack:
+                _stack[-1]["peak"] = max(_stack[-1]["peak"], peak)
+            record["peak_mb"] = (peak - frame["base"]) / 2**20
+        record["parent"] = _stack[-1].get("name") if _stack else None
+        record.update(info)
+        _emit(record)
+
+
+def summary(by=("stage",), data=None):
+    import pandas as pd
+
+    df = pd.DataFrame(records() if data is None else data)
+    if df.empty:
+        return df
+    by = list(by)
+    aggs = {
+        "calls": ("seconds", "size"),
+        "total_s": ("seconds", "sum"),
+        "mean_s": ("seconds", "mean"),
+        "max_s": ("seconds", "max"),
+        "rows": ("rows", "sum"),
+    }
+    if "peak_mb" in df:
+        aggs["peak_mb"] = ("peak_mb", "max")
+    table = df.groupby(by, dropna=False).agg(**aggs)
+    return table.sort_values("total_s", ascending=False)
+
+
+def read_records(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+@contextlib.contextmanager
+def session(path=None, memory=True, by=("stage",)):
+    reset()
+    enable(path, memory)
+    try:
+        yield
+    finally:
+        disable()
+        table = summary(by)
+        if not table.empty:
+            print(table.to_string(float_format="{:.3f}".format))
@@ -0,0 +1,230 @@
+# report.py
+#
+# One self-contained, interactive HTML page with every figure of a
+# build_figures spec, built with the same helper figure builders:
+#
+#   python -m charts_helper.report spec.json [--lang en] [--scenario turin]
+#                                  [--output report.html]
+#
+# plotly.js is embedded once in the page (or linked from its CDN with
+# --plotlyjs cdn) and every figure is stored as JSON in its own
+# <script type="application/json"> tag. Figures are only drawn when their
+# placeholder scrolls near the viewport, so opening the page costs a parse of
+# plotly.js and nothing more. The figures come from
+# build_figures.build_figure, so they follow the spec exactly as the exported
+# ones do, except that boxplots are drawn from their quartiles unless the
+# spec says otherwise, which keeps the raw samples out of the page; --raw
+# draws every boxplot from the raw samples, whatever the spec says. Figures
+# with more than --webgl-threshold points use WebGL (scattergl) traces.
+
+import argparse
+import contextlib
+import html
+import io
+import json
+import os
+import string
+import sys
+
+from charts_helper import build_figures
+from charts_helper import helper
+
+default_webgl_threshold = 5000
+
+page = string.Template("""<!DOCTYPE html>
+<html lang="$lang">
+<head>
+<meta charset="utf-8">
+<title>$title</title>
+<style>
+body { font-family: sans-serif; margin: 2em auto; max-width: ${max_width}px; }
+.figure { margin: 1em 0 3em; }
+.placeholder { background: #f4f4f4; }
+nav li { margin: 0.2em 0; }
+</style>
+$plotlyjs
+</head>
+<body>
+<h1>$title</h1>
+<nav><ul>
+$toc
+</ul></nav>
+$sections
+<script>
+(function () {
+  function draw(div) {
+    var fig = JSON.parse(document.getElementById(div.id + "-data").textContent);
+    div.classList.remove("placeholder");
+    Plotly.newPlot(div, fig.data, fig.layout, {responsive: true});
+  }
+  var divs = document.querySelectorAll(".figure");
+  if (!("IntersectionObserver" in window)) {
+    divs.forEach(draw);
+    return;
+  }
+  var observer = new IntersectionObserver(function (entries) {
+    entries.forEach(function (entry) {
+      if (entry.isIntersecting) {
+        observer.unobserve(entry.target);
+        draw(entry.target);
+      }
+    });
+  }, {rootMargin: "200px 0px"});
+  divs.forEach(function (div) { observer.observe(div); });
+})();
+</script>
+</body>
+</html>
+""")
+
+
+def scatter_points(fig):
+    # counted on the figure, before plotly packs its arrays into base64
+    # {"dtype", "bdata"} objects
+    points = 0
+    for trace in fig.data:
+        if trace.type == "scatter":
+            values = trace.x if trace.x is not None else trace.y
+            points += 0 if values is None else len(values)
+    return points
+
+
+def use_webgl(fig_json, points, threshold=default_webgl_threshold):
+    # all scatter traces of a figure switch together, so a figure uses at most
+    # one WebGL context; map traces already draw with WebGL
+    if points > threshold:
+        for trace in fig_json["data"]:
+            if trace.get("type") == "scatter":
+                trace["type"] = "scattergl"
+    return fig_json
+
+
+def figure_json(fig, width, height, webgl_threshold=default_webgl_threshold):
+    fig_json = json.loads(fig.to_json())
+    fig_json["layout"].pop("template", None)
+    fig_json["layout"].update(width=width, height=height)
+    return use_webgl(fig_json, scatter_points(fig), webgl_threshold)
+
+
+def _script_json(value):
+    # a JSON document inside <script> must not close the tag
+    return json.dumps(value, separators=(",", ":")).replace("</", "<\\/")
+
+
+def _plotlyjs(mode):
+    if mode == "cdn":
+        import plotly
+
+        return '<script src="https://cdn.plot.ly/plotly-{}.min.js"></script>'.format(
+            plotly.offline.get_plotlyjs_version()
+        )
+    from plotly.offline import get_plotlyjs
+
+    return "<script>{}</script>".format(get_plotlyjs())
+
+
+def render(spec, lang=None, scenario=None, cache=True, precomputed=None, **options):
+    # the page as a string; options are title, plotlyjs ("inline" or "cdn")
+    # and webgl_threshold. precomputed=None keeps what the spec and its
+    # figures ask for (quartiles by default), True or False applies to every
+    # boxplot
+    lang = lang or next(iter(spec["languages"]))
+    spec = dict(spec, precomputed=spec.get("precomputed", True))
+    webgl_threshold = options.get("webgl_threshold", default_webgl_threshold)
+    graph = build_figures.plan(spec)
+
+    sections = {}
+    max_width = 0
+    for name, figures in graph.items():
+        if scenario is not None:
+            figures = [f for f in figures if f["scenario"] == scenario]
+        if not figures:
+            continue
+        data = build_figures.load_dataset(spec["datasets"][name], cache)
+        for figure in figures:
+            print("{} <- {}".format(figure["name"], name), file=sys.stderr)
+            if precomputed is not None:
+                figure = dict(figure, precomputed=precomputed)
+            width = figure.get("width", spec.get("width", 600))
+            height = figure.get("height", spec.get("height", 480))
+            max_width = max(max_width, width)
+            # the quartile rows printed by the helpers are not part of the page
+            with contextlib.redirect_stdout(io.StringIO()):
+                fig = build_figures.build_figure(
+                    spec, figure, data, cache=False, output_dirs={lang: None}
+                )[lang]
+            sections.setdefault(figure["scenario"], []).append(
+                (
+                    figure,
+                    width,
+                    height,
+                    figure_json(fig, width, height, webgl_threshold),
+                )
+            )
+
+    toc = []
+    body = []
+    for key, entries in sections.items():
+        heading = html.escape(helper.scenarios[lang].get(key, key))
+        toc.append('<li><a href="#{0}">{1}</a></li>'.format(key, heading))
+        body.append('<h2 id="{}">{}</h2>'.format(key, heading))
+        for figure, width, height, fig_json in entries:
+            body.append(
+                '<div id="{0}" class="figure placeholder" '
+                'style="width:{1}px;height:{2}px"></div>\n'
+                '<script type="application/json" id="{0}-data">{3}</script>'.format(
+                    html.escape(figure["name"]), width, height, _script_json(fig_json)
+                )
+            )
+
+    return page.substitute(
+        lang=lang,
+        title=html.escape(options.get("title") or "Results"),
+        max_width=max(max_width, 600) + 40,
+        plotlyjs=_plotlyjs(options.get("plotlyjs", "inline")),
+        toc="\n".join(toc),
+        sections="\n".join(body),
+    )
+
+
+def write_report(spec, path, **options):
+    text = render(spec, **options)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m charts_helper.report")
+    parser.add_argument("spec")
+    parser.add_argument("--output", default="report.html")
+    parser.add_argument("--lang", default=None, help="defaults to the spec's first")
+    parser.add_argument("--scenario", default=None, help="only this scenario")
+    parser.add_argument("--title", default=None)
+    parser.add_argument("--plotlyjs", choices=["inline", "cdn"], default="inline")
+    parser.add_argument("--webgl-threshold", type=int, default=default_webgl_threshold)
+    parser.add_argument(
+        "--raw", action="store_true", help="draw boxplots from the raw samples"
+    )
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args(argv)
+
+    spec = build_figures.read_spec(args.spec)
+    path = write_report(
+        spec,
+        args.output,
+        lang=args.lang,
+        scenario=args.scenario,
+        cache=not args.no_cache,
+        precomputed=False if args.raw else None,
+        title=args.title,
+        plotlyjs=args.plotlyjs,
+        webgl_threshold=args.webgl_threshold,
+    )
+    print("{}: {:.1f} MB".format(path, os.path.getsize(path) / 2**20))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# significance.py
+#
+# Pairwise comparison of the preemption algorithms for each scenario and EV:
+# permutation test on the difference of medians, Cliff's delta and a
+# bootstrap interval of the median difference. Resampling is done with
+# batched NumPy index matrices.
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from charts_helper import helper
+
+default_metrics = ["tl", "perc", "imp", "preemptime"]
+
+# the columns of compare_algorithms after the group keys, metric and pair
+result_columns = [
+    "n_a",
+    "n_b",
+    "median_a",
+    "median_b",
+    "median_diff",
+    "ci_low",
+    "ci_high",
+    "cliffs_delta",
+    "p_value",
+    "p_holm",
+]
+
+
+def cliffs_delta(a, b):
+    greater = (a[:, None] > b[None, :]).sum()
+    less = (a[:, None] < b[None, :]).sum()
+    return (greater - less) / (len(a) * len(b))
+
+
+def _row_medians(values):
+    # np.median(values, axis=1), sorting short rows is much cheaper than partitioning
+    values = np.sort(values, axis=1)
+    n = values.shape[1]
+    return (values[:, (n - 1) // 2] + values[:, n // 2]) / 2
+
+
+def holm(p_values):
+    p_values = np.asarray(p_values, dtype=np.float64)
+    order = np.argsort(p_values)
+    scaled = p_values[order] * (len(p_values) - np.arange(len(p_values)))
+    adjusted = np.empty_like(p_values)
+    adjusted[order] = np.minimum(np.maximum.accumulate(scaled), 1)
+    return adjusted
+
+
+def _ordered_algs(names):
+    names = set(names)
+    return [alg for alg in helper.algs_order if alg in names] + sorted(
+        names.difference(helper.algs_order)
+    )
+
+
+def _compare_group(samples, resamples, confidence, rng):
+    algs = _ordered_algs(samples)
+
+    # bootstrap medians of every algorithm, reused by all of its pairs
+    boot_medians = {}
+    for alg in algs:
+        values = samples[alg]
+        idx = rng.integers(0, len(values), size=(resamples, len(values)))
+        boot_medians[alg] = _row_medians(values[idx])
+
+    # one permutation matrix per pooled sample size, shared by the pairs
+    permutations = {}
+    alpha = (1 - confidence) / 2
+    rows = []
+    for alg_a, alg_b in itertools.combinations(algs, 2):
+        a, b = samples[alg_a], samples[alg_b]
+        pooled = np.concatenate([a, b])
+        if len(pooled) not in permutations:
+            permutations[len(pooled)] = rng.random((resamples, len(pooled))).argsort(
+                axis=1
+            )
+        shuffled = pooled[permutations[len(pooled)]]
+        null = _row_medians(shuffled[:, : len(a)]) - _row_medians(shuffled[:, len(a) :])
+
+        observed = np.median(a) - np.median(b)
+        diffs = boot_medians[alg_a] - boot_medians[alg_b]
+        ci_low, ci_high = np.quantile(diffs, [alpha, 1 - alpha])
+
+        rows.append(
+            {
+                "alg_a": alg_a,
+                "alg_b": alg_b,
+                "n_a": len(a),
+                "n_b": len(b),
+                "median_a": np.median(a),
+                "median_b": np.median(b),
+                "median_diff": observed,
+                "ci_low": ci_low,
+                "ci_high": ci_high,
+                "cliffs_delta": cliffs_delta(a, b),
+                "p_value": (1 + np.sum(np.abs(null) >= np.abs(observed)))
+                / (resamples + 1),
+            }
+        )
+    return rows
+
+
+def compare_algorithms(
+    df,
+    metrics=None,
+    by=("scenario", "ev"),
+    resamples=10000,
+    confidence=0.95,
+    seed=None,
+):
+    by = list(by)
+    metrics = [m for m in (metrics or default_metrics) if m in df]
+    rng = np.random.default_rng(seed)
+
+    frames = []
+    for metric in metrics:
+        data = df.loc[df[metric].notnull(), by + ["alg", metric]]
+        for key, group in data.groupby(by, observed=True):
+            samples = {
+                alg: values[metric].to_numpy(dtype=np.float64)
+                for alg, values in group.groupby("alg", observed=True)
+                if len(values) > 1
+            }
+            if len(samples) < 2:
+                continue
+            rows = pd.DataFrame(_compare_group(samples, resamples, confidence, rng))
+            rows["p_holm"] = holm(rows["p_value"])
+            for name, value in zip(by, key):
+                rows[name] = value
+            rows["metric"] = metric
+            frames.append(rows)
+
+    columns = by + ["metric", "alg_a", "alg_b"]
+    if not frames:
+        # no group had two algorithms with more than one sample
+        return pd.DataFrame(columns=columns + result_columns)
+    table = pd.concat(frames, ignore_index=True)
+    return table[columns + [c for c in table.columns if c not in columns]]
+
+
+def significance_matrix(table, value="p_value", **selection):
+    # square alg x alg view of one (scenario, ev, metric) slice of the table
+    for column, wanted in selection.items():
+        table = table[table[column] == wanted]
+    upper = table.pivot(index="alg_a", columns="alg_b", values=value)
+    lower = table.pivot(index="alg_b", columns="alg_a", values=value)
+    if value in ("median_diff", "cliffs_delta"):
+        lower = -lower
+
+    algs = _ordered_algs(set(upper.index) | set(upper.columns))
+    return upper.combine_first(lower).reindex(index=algs, columns=algs)
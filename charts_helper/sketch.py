@@ -0,0 +1,274 @@
+# sketch.py
+#
+# Streaming summaries of the smartcity-tpn result schema. CSVs are read in
+# chunks and every (scenario, alg, ev) group of a metric keeps a mergeable
+# summary: count, mean and M2 (Chan et al. parallel update), exact min/max
+# and a merging t-digest of at most ~delta centroids, plus the tail_size
+# smallest and largest samples kept exactly. Groups with fewer samples than
+# the digest buffer are kept exact, so the usual result files give the same
+# numbers as stats.quartiles_table. The whiskers snap to the exact tail
+# samples when the Tukey limits fall inside them and are read off the digest
+# otherwise. summaries_table drops the smallest sample of every group, like
+# the helpers do, unless trim=False.
+
+import numpy as np
+import pandas as pd
+
+from charts_helper import stats
+
+default_delta = 200
+tail_size = 1000
+default_by = ["scenario", "alg", "ev"]
+
+
+def empty_summary():
+    return {
+        "count": 0,
+        "mean": 0.0,
+        "m2": 0.0,
+        "min": np.inf,
+        "max": -np.inf,
+        "means": np.empty(0),
+        "weights": np.empty(0),
+        "low": np.empty(0),
+        "high": np.empty(0),
+    }
+
+
+def _compress(means, weights, delta):
+    order = np.argsort(means, kind="mergesort")
+    means, weights = means[order], weights[order]
+    total = weights.sum()
+
+    # k1 scale function: centroids whose midpoints fall in the same unit of k
+    # are merged, which keeps the tails fine-grained and the centre coarse
+    q = (np.cumsum(weights) - weights / 2) / total
+    k = delta / (2 * np.pi) * np.arcsin(2 * q - 1)
+    _, bins = np.unique(np.floor(k), return_inverse=True)
+
+    merged_weights = np.bincount(bins, weights=weights)
+    merged_means = np.bincount(bins, weights=means * weights) / merged_weights
+    return merged_means, merged_weights
+
+
+def merge(a, b, delta=default_delta):
+    if a["count"] == 0:
+        return dict(b)
+    if b["count"] == 0:
+        return dict(a)
+
+    count = a["count"] + b["count"]
+    diff = b["mean"] - a["mean"]
+    means = np.concatenate([a["means"], b["means"]])
+    weights = np.concatenate([a["weights"], b["weights"]])
+    if len(means) > 5 * delta:
+        means, weights = _compress(means, weights, delta)
+
+    return {
+        "count": count,
+        "mean": a["mean"] + diff * b["count"] / count,
+        "m2": a["m2"] + b["m2"] + diff**2 * a["count"] * b["count"] / count,
+        "min": min(a["min"], b["min"]),
+        "max": max(a["max"], b["max"]),
+        "means": means,
+        "weights": weights,
+        "low": np.sort(np.concatenate([a["low"], b["low"]]))[:tail_size],
+        "high": np.sort(np.concatenate([a["high"], b["high"]]))[-tail_size:],
+    }
+
+
+def _tails(values):
+    # the tail_size smallest and largest values, sorted
+    if len(values) <= tail_size:
+        values = np.sort(values)
+        return values, values
+    low = np.partition(values, tail_size - 1)[:tail_size]
+    high = np.partition(values, len(values) - tail_size)[-tail_size:]
+    return np.sort(low), np.sort(high)
+
+
+def from_values(values):
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return empty_summary()
+    mean = values.mean()
+    low, high = _tails(values)
+    return {
+        "count": len(values),
+        "mean": mean,
+        "m2": ((values - mean) ** 2).sum(),
+        "min": values.min(),
+        "max": values.max(),
+        "means": values,
+        "weights": np.ones(len(values)),
+        "low": low,
+        "high": high,
+    }
+
+
+def update(summary, values, delta=default_delta):
+    return merge(summary, from_values(values), delta)
+
+
+def is_exact(summary):
+    return len(summary["weights"]) == summary["count"]
+
+
+def trim_smallest(summary):
+    # the summary without its smallest sample, as stats.trim_groups does
+    if summary["count"] <= 1:
+        return empty_summary()
+
+    x = summary["low"][0]
+    count = summary["count"] - 1
+    mean = summary["mean"] + (summary["mean"] - x) / count
+    means, weights = summary["means"].copy(), summary["weights"].copy()
+    first = np.argmin(means)
+    if weights[first] <= 1:
+        means, weights = np.delete(means, first), np.delete(weights, first)
+    else:
+        means[first] = (means[first] * weights[first] - x) / (weights[first] - 1)
+        weights[first] -= 1
+
+    high = summary["high"]
+    return {
+        "count": count,
+        "mean": mean,
+        "m2": summary["m2"] - (x - summary["mean"]) * (x - mean),
+        "min": summary["low"][1],
+        "max": summary["max"],
+        "means": means,
+        "weights": weights,
+        "low": summary["low"][1:],
+        "high": high[1:] if high[0] == x else high,
+    }
+
+
+def _curve(summary):
+    # the digest as a piecewise linear map from rank to value
+    order = np.argsort(summary["means"], kind="mergesort")
+    means, weights = summary["means"][order], summary["weights"][order]
+    centres = np.cumsum(weights) - weights / 2
+    ranks = np.concatenate([[0], centres, [summary["count"]]])
+    values = np.concatenate([[summary["min"]], means, [summary["max"]]])
+    return ranks, values
+
+
+def quantile(summary, q):
+    if is_exact(summary):
+        # Series.quantile(q, interpolation="midpoint")
+        means = np.sort(summary["means"])
+        pos = q * (len(means) - 1)
+        return (means[int(np.floor(pos))] + means[int(np.ceil(pos))]) / 2
+
+    ranks, values = _curve(summary)
+    return np.interp(q * summary["count"], ranks, values)
+
+
+def _whiskers(summary, low, high):
+    # the smallest sample >= low and the largest <= high
+    if is_exact(summary):
+        points = np.sort(summary["means"])
+        return (
+            points[np.searchsorted(points, low, side="left")],
+            points[np.searchsorted(points, high, side="right") - 1],
+        )
+
+    # sample i (from 1) of the digest sits at rank i - 1/2
+    ranks, values = _curve(summary)
+    if low <= summary["min"]:
+        lower = summary["min"]
+    elif low <= summary["low"][-1]:
+        lower = summary["low"][np.searchsorted(summary["low"], low, side="left")]
+    else:
+        rank = np.ceil(np.interp(low, values, ranks) - 0.5) + 0.5
+        lower = np.interp(rank, ranks, values)
+
+    if high >= summary["max"]:
+        upper = summary["max"]
+    elif high >= summary["high"][0]:
+        upper = summary["high"][
+            np.searchsorted(summary["high"], high, side="right") - 1
+        ]
+    else:
+        rank = np.floor(np.interp(high, values, ranks) + 0.5) - 0.5
+        upper = np.interp(rank, ranks, values)
+    return lower, upper
+
+
+def box_stats(summary):
+    q1 = quantile(summary, 0.25)
+    median = quantile(summary, 0.5)
+    q3 = quantile(summary, 0.75)
+    iqr = q3 - q1
+    lower_fence, upper_fence = _whiskers(summary, q1 - 1.5 * iqr, q3 + 1.5 * iqr)
+
+    return {
+        "n": summary["count"],
+        "min": summary["min"],
+        "lower_fence": lower_fence,
+        "q1": q1,
+        "median": median,
+        "q3": q3,
+        "upper_fence": upper_fence,
+        "max": summary["max"],
+        "min_outlier": summary["min"] if summary["min"] < lower_fence else np.nan,
+        "max_outlier": summary["max"] if summary["max"] > upper_fence else np.nan,
+        "mean": summary["mean"],
+        "std": (
+            np.sqrt(summary["m2"] / (summary["count"] - 1))
+            if summary["count"] > 1
+            else np.nan
+        ),
+    }
+
+
+def stream_summaries(
+    paths,
+    metrics,
+    by=default_by,
+    chunksize=100_000,
+    delta=default_delta,
+    summaries=None,
+):
+    # {metric: {group key: summary}}; pass the result back in to keep adding files
+    by = list(by)
+    summaries = summaries if summaries is not None else {}
+
+    for path in [paths] if isinstance(paths, str) else paths:
+        header = pd.read_csv(path, nrows=0).columns
+        wanted = [m for m in metrics if m in header]
+        for chunk in pd.read_csv(path, usecols=by + wanted, chunksize=chunksize):
+            for metric in wanted:
+                groups = summaries.setdefault(metric, {})
+                data = chunk.loc[chunk[metric].notnull(), by + [metric]]
+                for key, values in data.groupby(by, sort=False)[metric]:
+                    groups[key] = update(
+                        groups.get(key, empty_summary()), values.to_numpy(), delta
+                    )
+
+    return summaries
+
+
+def merge_summaries(a, b, delta=default_delta):
+    merged = {metric: dict(groups) for metric, groups in a.items()}
+    for metric, groups in b.items():
+        target = merged.setdefault(metric, {})
+        for key, summary in groups.items():
+            target[key] = merge(target.get(key, empty_summary()), summary, delta)
+    return merged
+
+
+def summaries_table(summaries, metric, by=default_by, trim=True):
+    # same layout as stats.quartiles_table, plus mean and std; with trim the
+    # smallest sample of each group is dropped and single-sample groups with it
+    groups = summaries[metric]
+    if trim:
+        groups = {key: trim_smallest(s) for key, s in groups.items()}
+        groups = {key: s for key, s in groups.items() if s["count"] > 0}
+    keys = sorted(groups)
+    rows = [box_stats(groups[key]) for key in keys]
+    index = pd.MultiIndex.from_tuples(keys, names=list(by))
+    return pd.DataFrame(
+        rows, index=index, columns=stats.quartile_columns + ["mean", "std"]
+    )
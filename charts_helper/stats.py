@@ -0,0 +1,169 @@
+# stats.py
+
+import numpy as np
+import pandas as pd
+
+# language used for the numbers of the LaTeX rows when a call does not pick one
+number_lang = "br"
+
+number_separators = {
+    "br": str.maketrans({",": ".", ".": ","}),
+    "en": str.maketrans({}),
+}
+
+quartile_columns = [
+    "n",
+    "min",
+    "lower_fence",
+    "q1",
+    "median",
+    "q3",
+    "upper_fence",
+    "max",
+    "min_outlier",
+    "max_outlier",
+]
+
+
+def trim_groups(df, metric, by=("alg", "ev")):
+    # per group equivalent of Series.nlargest(size - 1): the smallest sample of
+    # each group is dropped and the rest is kept in descending order
+    by = list(by)
+    data = df.sort_values(
+        by + [metric], ascending=[True] * len(by) + [False], kind="mergesort"
+    )
+    keep = data.groupby(by, sort=False, observed=True).cumcount(ascending=False) > 0
+    return data[keep]
+
+
+def _midpoint_quantile(values, starts, sizes, q):
+    # same as Series.quantile(q, interpolation="midpoint") for every group
+    pos = q * (sizes - 1)
+    lower = starts + np.floor(pos).astype(np.int64)
+    upper = starts + np.ceil(pos).astype(np.int64)
+    return (values[lower] + values[upper]) / 2
+
+
+def quartiles_table(df, metric, by=("alg", "ev")):
+    by = list(by)
+    data = df.loc[df[metric].notnull(), by + [metric]].sort_values(by + [metric])
+
+    groups = data.groupby(by, sort=False, observed=True)
+    sizes = groups.size()
+    index = sizes.index
+    sizes = sizes.to_numpy()
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    group_ids = np.repeat(np.arange(len(sizes)), sizes)
+    values = data[metric].to_numpy(dtype=np.float64)
+
+    if len(values) == 0:
+        return pd.DataFrame(columns=quartile_columns, index=index)
+
+    median = _midpoint_quantile(values, starts, sizes, 0.5)
+    q1 = _midpoint_quantile(values, starts, sizes, 0.25)
+    q3 = _midpoint_quantile(values, starts, sizes, 0.75)
+
+    iqr = q3 - q1
+    lower_limit = q1 - (1.5 * iqr)
+    upper_limit = q3 + (1.5 * iqr)
+
+    # the whiskers are snapped to the closest sample inside the Tukey limits
+    below = np.bincount(
+        group_ids, weights=values < lower_limit[group_ids], minlength=len(sizes)
+    ).astype(np.int64)
+    not_above = np.bincount(
+        group_ids, weights=values <= upper_limit[group_ids], minlength=len(sizes)
+    ).astype(np.int64)
+    lower_fence = values[starts + below]
+    upper_fence = values[starts + not_above - 1]
+
+    min_value = values[starts]
+    max_value = values[starts + sizes - 1]
+
+    return pd.DataFrame(
+        {
+            "n": sizes,
+            "min": min_value,
+            "lower_fence": lower_fence,
+            "q1": q1,
+            "median": median,
+            "q3": q3,
+            "upper_fence": upper_fence,
+            "max": max_value,
+            "min_outlier": np.where(min_value < lower_fence, min_value, np.nan),
+            "max_outlier": np.where(max_value > upper_fence, max_value, np.nan),
+        },
+        index=index,
+    )
+
+
+def outliers(df, metric, table, by=("alg", "ev")):
+    # samples outside the whiskers of table, one sorted array per table row
+    by = list(by)
+    data = df.loc[df[metric].notnull(), by + [metric]].sort_values(by + [metric])
+    keys = pd.MultiIndex.from_frame(data[by]) if len(by) > 1 else pd.Index(data[by[0]])
+    fences = table[["lower_fence", "upper_fence"]].reindex(keys).to_numpy()
+    values = data[metric].to_numpy(dtype=np.float64)
+    data = data[(values < fences[:, 0]) | (values > fences[:, 1])]
+
+    found = {
+        key: group[metric].to_numpy(dtype=np.float64)
+        for key, group in data.groupby(
+            by if len(by) > 1 else by[0], sort=False, observed=True
+        )
+    }
+    return [found.get(key, np.empty(0)) for key in table.index]
+
+
+def format_number(value, lang=None, grouping=False):
+    # "%.2f" with the pt_BR or en separators, without touching the process locale
+    text = "{:,.2f}".format(value) if grouping else "{:.2f}".format(value)
+    return text.translate(number_separators[lang or number_lang])
+
+
+def format_numbers(values, lang=None, grouping=False, missing=" - "):
+    # format_number over a whole column, NaN becomes `missing`
+    values = pd.Series(np.asarray(values, dtype=np.float64))
+    pattern = "{:,.2f}" if grouping else "{:.2f}"
+    text = values.map(pattern.format).str.translate(
+        number_separators[lang or number_lang]
+    )
+    return text.where(values.notnull(), missing).to_numpy()
+
+
+def latex_rows(labels, table, lang=None):
+    # latex_row for every row of a quartiles table
+    cells = [
+        format_numbers(table["min_outlier"], lang),
+        format_numbers(table["lower_fence"], lang, grouping=True),
+        format_numbers(table["q1"], lang, grouping=True),
+        format_numbers(table["median"], lang, grouping=True),
+        format_numbers(table["q3"], lang, grouping=True),
+        format_numbers(table["upper_fence"], lang, grouping=True),
+        format_numbers(table["max_outlier"], lang),
+    ]
+    return [
+        "{} & {} \\\\".format(label, " & ".join(row))
+        for label, row in zip(labels, zip(*cells))
+    ]
+
+
+def latex_row(label, row, lang=None):
+    cells = [
+        (
+            format_number(row["min_outlier"], lang)
+            if not np.isnan(row["min_outlier"])
+            else " - "
+        ),
+        format_number(row["lower_fence"], lang, grouping=True),
+        format_number(row["q1"], lang, grouping=True),
+        format_number(row["median"], lang, grouping=True),
+        format_number(row["q3"], lang, grouping=True),
+        format_number(row["upper_fence"], lang, grouping=True),
+        (
+            format_number(row["max_outlier"], lang)
+            if not np.isnan(row["max_outlier"])
+            else " - "
+        ),
+    ]
+    return "{} & {} \\\\".format(label, " & ".join(cells))
@@ -0,0 +1,203 @@
+# tables.py
+#
+# Writes the quartile/whisker summaries that the boxplot helpers print as
+# complete LaTeX and CSV tables, without building any figure:
+#
+#   python -m charts_helper.tables results.csv [...] --output-dir tables
+#
+# summary_table computes every scenario x alg x ev x metric group in one
+# stats.quartiles_table call over the long form of the results, dropping the
+# smallest sample of each group like the figures do. write_tables formats it
+# in bulk and writes one {scenario}-{metric}.tex/.csv pair per scenario and
+# metric, plus summary.csv with everything. --stream builds the same table
+# from sketch summaries, for files too large to load at once. The .tex files are booktabs
+# tabulars meant to be \input inside a table environment. CSVs use "," for
+# en and ";" with decimal commas for br, so spreadsheets open them as numbers.
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from charts_helper import helper
+from charts_helper import stats
+
+default_metrics = ["tl", "tl-ttt", "perc", "imp", "preemptime", "rt"]
+default_by = ["scenario", "alg", "ev"]
+
+column_labels = {
+    "en": [
+        "Min. outlier",
+        "Lower whisker",
+        "Q1",
+        "Median",
+        "Q3",
+        "Upper whisker",
+        "Max. outlier",
+    ],
+    "br": [
+        "Outlier mín.",
+        "Limite inferior",
+        "Q1",
+        "Mediana",
+        "Q3",
+        "Limite superior",
+        "Outlier máx.",
+    ],
+}
+
+csv_formats = {
+    "en": dict(sep=",", decimal=".", float_format="%.2f"),
+    "br": dict(sep=";", decimal=",", float_format="%.2f"),
+}
+
+latex_escapes = str.maketrans({c: "\\" + c for c in "&%$#_{}"})
+
+
+def summary_table(df, metrics=None, by=default_by, trim=True):
+    by = list(by)
+    metrics = [m for m in (metrics or default_metrics) if m in df]
+    long = df.melt(id_vars=by, value_vars=metrics, var_name="metric")
+    long = long[long["value"].notnull()]
+    if trim:
+        long = stats.trim_groups(long, "value", by=["metric"] + by)
+    return stats.quartiles_table(long, "value", by=["metric"] + by)
+
+
+def streamed_summary_table(
+    paths, metrics=None, by=default_by, trim=True, chunksize=100_000
+):
+    # summary_table for files too large to load, from sketch summaries read in
+    # chunks; derived columns (tl-ttt) are not available this way
+    from charts_helper import sketch
+
+    metrics = metrics or default_metrics
+    summaries = sketch.stream_summaries(paths, metrics, by, chunksize)
+    tables = {
+        metric: sketch.summaries_table(summaries, metric, by, trim)[
+            stats.quartile_columns
+        ]
+        for metric in metrics
+        if metric in summaries
+    }
+    return pd.concat(tables, names=["metric"]).sort_index()
+
+
+def _ordered(names, order):
+    names = list(dict.fromkeys(names))
+    return [n for n in order if n in names] + sorted(
+        (n for n in names if n not in order), key=str
+    )
+
+
+def _label(names, value):
+    return str(names.get(value, value)).translate(latex_escapes)
+
+
+def latex_table(table, rows, lang):
+    # table and rows (its formatted LaTeX rows) hold one scenario and metric
+    # and are indexed by (alg, ev)
+    lines = [
+        "\\begin{tabular}{l" + "r" * len(column_labels[lang]) + "}",
+        "\\toprule",
+        "EV & {} \\\\".format(" & ".join(column_labels[lang])),
+    ]
+    algs = table.index.get_level_values("alg")
+    for alg in _ordered(algs, helper.algs_order):
+        lines.append("\\midrule")
+        lines.append(
+            "\\multicolumn{{{}}}{{l}}{{\\textbf{{{}}}}} \\\\".format(
+                len(column_labels[lang]) + 1, _label(helper.algs_name[lang], alg)
+            )
+        )
+        lines.extend(rows[np.flatnonzero(algs == alg)])
+    lines += ["\\bottomrule", "\\end{tabular}", ""]
+    return "\n".join(lines)
+
+
+def write_tables(table, output_dir="tables", lang="br", formats=("tex", "csv")):
+    os.makedirs(output_dir, exist_ok=True)
+    by = [name for name in table.index.names if name != "metric"]
+
+    # everything is formatted at once, the files only pick their slices
+    labels = [
+        _label(helper.evs_name[lang], ev) for ev in table.index.get_level_values("ev")
+    ]
+    rows = np.array(stats.latex_rows(labels, table, lang), dtype=object)
+
+    flat = table.reset_index()
+    flat["row"] = np.arange(len(flat))
+    written = []
+    for (metric, scenario), group in flat.groupby(
+        ["metric", "scenario"], sort=True, observed=True
+    ):
+        name = os.path.join(output_dir, "{}-{}".format(scenario, metric))
+        if "tex" in formats:
+            part = table.iloc[group["row"].to_numpy()].droplevel(["metric", "scenario"])
+            with open(name + ".tex", "w") as f:
+                f.write(latex_table(part, rows[group["row"].to_numpy()], lang))
+            written.append(name + ".tex")
+        if "csv" in formats:
+            group[by + stats.quartile_columns].to_csv(
+                name + ".csv", index=False, **csv_formats[lang]
+            )
+            written.append(name + ".csv")
+
+    if "csv" in formats:
+        path = os.path.join(output_dir, "summary.csv")
+        flat[["metric"] + by + stats.quartile_columns].to_csv(
+            path, index=False, **csv_formats[lang]
+        )
+        written.append(path)
+    return written
+
+
+def main(argv=None):
+    from charts_helper import loader
+
+    parser = argparse.ArgumentParser(prog="python -m charts_helper.tables")
+    parser.add_argument("results", nargs="+", help="result CSVs")
+    parser.add_argument("--output-dir", default="tables")
+    parser.add_argument(
+        "--langs", nargs="+", default=["br"], help="one subdirectory per language"
+    )
+    parser.add_argument("--metrics", nargs="+", default=None)
+    parser.add_argument("--formats", nargs="+", default=["tex", "csv"])
+    parser.add_argument(
+        "--no-trim", action="store_true", help="keep the smallest sample of each group"
+    )
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="read the files in chunks into streaming summaries",
+    )
+    args = parser.parse_args(argv)
+
+    if args.stream:
+        table = streamed_summary_table(
+            args.results, args.metrics, trim=not args.no_trim
+        )
+    else:
+        df = pd.concat(
+            [
+                loader.load_results(path, cache=not args.no_cache)
+                for path in args.results
+            ],
+            ignore_index=True,
+        )
+        table = summary_table(df, args.metrics, trim=not args.no_trim)
+
+    for lang in args.langs:
+        output_dir = (
+            args.output_dir
+            if len(args.langs) == 1
+            else os.path.join(args.output_dir, lang)
+        )
+        written = write_tables(table, output_dir, lang, args.formats)
+        print("{}: {} files in {}".format(lang, len(written), output_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# trajectories.py
+#
+# Binary store for the GPS traces, written once and then memory-mapped:
+#
+#   store = trajectories.load("smartcity-tpn/turin-gps.csv")
+#   helper.make_map(trajectories.to_frame(store, scenario="turin"), ...)
+#   route = trajectories.route(store, "turin", "vehev1")
+#
+# A store is a directory with contiguous lon.npy/lat.npy (float64) and
+# step.npy (int32) arrays, sorted by (scenario, ev, step), an offsets.npy
+# index where route i spans offsets[i]:offsets[i + 1], and index.json with
+# the (scenario, ev) key of every route. open_store maps the arrays read-only,
+# so slicing a route only touches the pages it lives on. load converts a GPS
+# CSV once into the loader cache directory and opens the store from there
+# afterwards.
+
+import glob
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from charts_helper import loader
+from charts_helper import profiling
+
+store_version = 1
+
+arrays = {"lon": np.float64, "lat": np.float64, "step": np.int32}
+
+
+def _store(lon, lat, step, offsets, keys, path=None):
+    index = pd.MultiIndex.from_tuples(keys, names=["scenario", "ev"])
+    return {
+        "path": path,
+        "lon": lon,
+        "lat": lat,
+        "step": step,
+        "offsets": offsets,
+        "index": index,
+        "routes": {key: i for i, key in enumerate(keys)},
+    }
+
+
+def from_frame(df):
+    # an in-memory store from a GPS frame (scenario, ev, step, lon, lat)
+    df = df.sort_values(["scenario", "ev", "step"], kind="mergesort")
+    sizes = df.groupby(["scenario", "ev"], sort=False, observed=True).size()
+    offsets = np.concatenate([[0], np.cumsum(sizes.to_numpy())]).astype(np.int64)
+    return _store(
+        *(df[name].to_numpy(dtype=dtype) for name, dtype in arrays.items()),
+        offsets,
+        [(str(scenario), str(ev)) for scenario, ev in sizes.index],
+    )
+
+
+def write(store, path):
+    # written next to path and renamed into place, readers never see half
+    # a store
+    tmp = path + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name in list(arrays) + ["offsets"]:
+        np.save(os.path.join(tmp, name + ".npy"), np.ascontiguousarray(store[name]))
+    with open(os.path.join(tmp, "index.json"), "w") as f:
+        json.dump({"version": store_version, "routes": list(store["index"])}, f)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+    return path
+
+
+def open_store(path):
+    with open(os.path.join(path, "index.json")) as f:
+        index = json.load(f)
+    if index["version"] != store_version:
+        raise ValueError(
+            "{}: store version {}, expected {}".format(
+                path, index["version"], store_version
+            )
+        )
+    lon, lat, step, offsets = (
+        np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+        for name in list(arrays) + ["offsets"]
+    )
+    return _store(
+        lon, lat, step, offsets, [tuple(key) for key in index["routes"]], path
+    )
+
+
+def load(path, cache=True, cache_dir=None):
+    # a store directory is opened as is; a GPS CSV is converted on first use
+    path = os.path.expanduser(path)
+    with profiling.stage("load", path=path) as info:
+        if os.path.isdir(path):
+            store = open_store(path)
+        elif not cache:
+            store = from_frame(pd.read_csv(path))
+        else:
+            prefix, cached = loader._cache_path(
+                path, cache_dir or loader.default_cache_dir, ".traj"
+            )
+            if not os.path.exists(cached):
+                os.makedirs(os.path.dirname(cached), exist_ok=True)
+                write(from_frame(pd.read_csv(path)), cached)
+                for stale in glob.glob("{}-*.traj".format(prefix)):
+                    if stale != cached:
+                        shutil.rmtree(stale, ignore_errors=True)
+            store = open_store(cached)
+        info["rows"] = len(store["lon"])
+    return store
+
+
+def route(store, scenario, ev):
+    # views into the store, nothing is read until they are used
+    i = store["routes"][(scenario, ev)]
+    span = slice(store["offsets"][i], store["offsets"][i + 1])
+    return {name: store[name][span] for name in arrays}
+
+
+def select(store, scenario=None, ev=None):
+    # positions of the routes of the given scenario(s) and ev(s)
+    keep = np.ones(len(store["index"]), dtype=bool)
+    for level, values in [("scenario", scenario), ("ev", ev)]:
+        if values is not None:
+            values = [values] if isinstance(values, str) else list(values)
+            keep &= store["index"].get_level_values(level).isin(values)
+    return np.flatnonzero(keep)
+
+
+def to_frame(store, scenario=None, ev=None):
+    # the GPS frame (scenario, ev, step, lon, lat) of the selected routes, as
+    # helper.make_map and geo.route_metrics take it; only their rows are read
+    positions = select(store, scenario, ev)
+    starts = store["offsets"][positions]
+    sizes = store["offsets"][positions + 1] - starts
+    rows = np.repeat(starts - np.cumsum(sizes) + sizes, sizes) + np.arange(sizes.sum())
+
+    keys = store["index"][positions]
+    frame = {
+        level: pd.Categorical.from_codes(
+            np.repeat(keys.codes[i], sizes), keys.levels[i]
+        ).remove_unused_categories()
+        for i, level in enumerate(keys.names)
+    }
+    # consecutive routes are read as one slice, scattered ones by fancy indexing
+    if len(positions) and (np.diff(positions) == 1).all():
+        span = slice(starts[0], starts[0] + sizes.sum())
+        frame.update({name: np.array(store[name][span]) for name in arrays})
+    else:
+        frame.update({name: store[name][rows] for name in arrays})
+    return pd.DataFrame(frame)